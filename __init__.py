@@ -1,10 +1,21 @@
 import bpy
 from bpy.types import Operator, Panel, PropertyGroup
-from bpy.props import IntProperty, EnumProperty, BoolProperty, PointerProperty
+from bpy.props import IntProperty, EnumProperty, BoolProperty, PointerProperty, StringProperty
 from bpy.utils import register_class, unregister_class, previews
+from bpy.app.handlers import persistent
 import os
 import json
+import re
+import subprocess
+import tempfile
+import time
+import zlib
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
 from mathutils import Matrix
+from . import transforms
 
 
 
@@ -33,17 +44,123 @@ axes = [
 global locators_RT_name_list
 locators_RT_name_list = []
 
+
+class LocaProfiler:
+    """Stage timings and counters of the running operator, collected when profiling is enabled"""
+    current = None
+    last_report = None
+    # Per-locator playback costs of the last constraint profile
+    constraint_report = None
+
+    @classmethod
+    def finish(cls, report, props):
+        cls.last_report = report
+        return cls.log(report, props)
+
+    # Append a report to the JSONL log, return an error message if the log can't be written
+    @classmethod
+    def log(cls, report, props):
+        if not props.profile_log_path:
+            return None
+        try:
+            with open(bpy.path.abspath(props.profile_log_path), 'a') as f:
+                f.write(json.dumps(report) + "\n")
+        except OSError as e:
+            return f"Profile log writing error: {e}"
+        return None
+
+@contextmanager
+def profile_stage(name):
+    report = LocaProfiler.current
+    if report is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage = report['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += time.perf_counter() - start
+        stage['calls'] += 1
+
+def profile_count(counter, amount=1):
+    report = LocaProfiler.current
+    if report is not None:
+        report['counters'][counter] = report['counters'].get(counter, 0) + amount
+
+# Decorator timing every call of a helper as a profiling stage
+def profiled(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with profile_stage(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+def count_datablocks():
+    return {name: len(getattr(bpy.data, name)) for name in ('objects', 'meshes', 'actions')}
+
+# New profile report of an operator, timed from now until end_operator_profile
+def begin_operator_profile(operator):
+    return {
+        'operator': operator.bl_idname,
+        'blend_file': bpy.data.filepath,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': 0.0,
+        'stages': {},
+        'counters': {},
+        'datablocks_before': count_datablocks(),
+        'start': time.perf_counter(),
+    }
+
+# Finish the profile report of an operator and log it, warning through the operator if the log fails
+def end_operator_profile(operator, report, props):
+    report['seconds'] = time.perf_counter() - report.pop('start')
+    datablocks_before = report.pop('datablocks_before')
+    datablocks_after = count_datablocks()
+    report['counters']['datablocks_created'] = sum(
+        max(0, datablocks_after[name] - datablocks_before[name]) for name in datablocks_after)
+    error = LocaProfiler.finish(report, props)
+    if error:
+        operator.report({'WARNING'}, error)
+
+# Decorator collecting a profile report for each invocation of an operator execute method
+def profiled_operator(execute):
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        props = context.scene.loca
+        # Operators called from another Loca operator are profiled as a stage of the outer one
+        if not props.profile_operators or LocaProfiler.current is not None:
+            with profile_stage(self.bl_idname):
+                return execute(self, context)
+
+        report = begin_operator_profile(self)
+        LocaProfiler.current = report
+        try:
+            return execute(self, context)
+        finally:
+            LocaProfiler.current = None
+            end_operator_profile(self, report, props)
+    return wrapper
+
+def action_key_count(action):
+    return sum(len(fcurve.keyframe_points) for fcurve in action.fcurves) if action else 0
+
+@profiled
 def select_bones(context, bone_names):
-    armature = context.object
-    bpy.ops.pose.select_all(action='DESELECT')    
+    bones = context.object.data.bones
     if isinstance(bone_names, str):
         bone_names = [bone_names]
+    selection = np.zeros(len(bones), dtype=bool)
     for bone_name in bone_names:
-        if bone_name in armature.pose.bones:
-            armature.pose.bones[bone_name].bone.select = True
+        index = bones.find(bone_name)
+        if index >= 0:
+            selection[index] = True
+    bones.foreach_set('select', selection)
 
+# Edit bones only exist in edit mode, so switching modes is the one operator call left in the helpers
+@profiled
 def set_armature_mode(context, mode):
-    if context.mode != mode:
+    if context.active_object.mode != mode:
         bpy.ops.object.mode_set(mode=mode)
 
 def remove_constraints_by_name_part(pose_bone, name_part):
@@ -52,13 +169,15 @@ def remove_constraints_by_name_part(pose_bone, name_part):
         for constraint in constraints_to_remove:
             pose_bone.constraints.remove(constraint)
 
+@profiled
 def set_keys_on_constraint_influence(constraint, st_frame, end_frame):
-    constraint.influence = 0
-    constraint.keyframe_insert(data_path="influence", frame=st_frame-1)
-    constraint.keyframe_insert(data_path="influence", frame=end_frame+1)
+    # Later keys win on the same frame, like consecutive keyframe_insert calls
+    keys = {st_frame - 1: 0.0, end_frame + 1: 0.0, st_frame: 1.0, end_frame: 1.0}
+    pose_bone_path = constraint.path_from_id().rsplit('.constraints[', 1)[0]
+    group_name = constraint.id_data.path_resolve(pose_bone_path).name
+    write_fcurve_channels(ensure_action(constraint.id_data), constraint.path_from_id('influence'), group_name,
+                          list(keys), list(keys.values()))
     constraint.influence = 1.0
-    constraint.keyframe_insert(data_path="influence", frame=st_frame)
-    constraint.keyframe_insert(data_path="influence", frame=end_frame)
 
 def apply_constraint(pose_bone, constraint_type, target, subtarget, track_axis=None):
     constraint = pose_bone.constraints.new(constraint_type)
@@ -69,51 +188,1363 @@ def apply_constraint(pose_bone, constraint_type, target, subtarget, track_axis=N
     constraint.name += "_LOCA"
     return constraint
 
+def keys_removed_message(props, keys_removed):
+    message = f' ({keys_removed} redundant keys removed)' if props.reduce_keys else ''
+    if props.bake_engine == 'ADAPTIVE':
+        message += AdaptiveBakeStats.consume_message()
+    return message
+
 def show_message_box(message="", ttl="Message Box", ic='INFO'):
+    if bpy.app.background:
+        print(f"{ttl}: {message}")
+        return
     def draw(self, context):
         self.layout.label(text=message)
     bpy.context.window_manager.popup_menu(draw, title=ttl, icon=ic)
 
+BONE_DATA_PATH = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]\.?(.*)$')
+
+# Split 'pose.bones["name"].prop' data paths into the bone name and the rest of the path
+def split_bone_data_path(data_path):
+    match = BONE_DATA_PATH.match(data_path)
+    if match is None:
+        return None, data_path
+    return bpy.utils.unescape_identifier(match.group(1)), match.group(2)
+
+
+class FCurveIndex:
+    """F-curves of an action grouped by bone name and channel, built in a single pass over the action"""
+
+    def __init__(self, action):
+        self.action = action
+        self.bone_fcurves = {}
+        self.other_fcurves = []
+        if action is not None:
+            profile_count('fcurves_scanned', len(action.fcurves))
+            for fcurve in action.fcurves:
+                bone_name, channel = split_bone_data_path(fcurve.data_path)
+                if bone_name is None:
+                    self.other_fcurves.append(fcurve)
+                else:
+                    self.bone_fcurves.setdefault(bone_name, []).append((channel, fcurve))
+
+    @classmethod
+    def from_object(cls, obj):
+        return cls(obj.animation_data.action if obj.animation_data else None)
+
+    def bone_names(self, name_filter=None):
+        return [bone_name for bone_name in self.bone_fcurves if name_filter is None or name_filter(bone_name)]
+
+    def fcurves(self, bone_name, channel_filter=None):
+        return [fcurve for channel, fcurve in self.bone_fcurves.get(bone_name, ())
+                if channel_filter is None or channel_filter(channel)]
+
+    def remove_bone_fcurves(self, bone_name, channel_filter=None):
+        removed = []
+        kept = []
+        for channel, fcurve in self.bone_fcurves.get(bone_name, ()):
+            (removed if channel_filter is None or channel_filter(channel) else kept).append((channel, fcurve))
+        if kept:
+            self.bone_fcurves[bone_name] = kept
+        else:
+            self.bone_fcurves.pop(bone_name, None)
+        for channel, fcurve in removed:
+            self.action.fcurves.remove(fcurve)
+        return len(removed)
+
+    def remove_other_fcurves(self, data_path_filter):
+        removed = [fcurve for fcurve in self.other_fcurves if data_path_filter(fcurve.data_path)]
+        self.other_fcurves = [fcurve for fcurve in self.other_fcurves if not data_path_filter(fcurve.data_path)]
+        for fcurve in removed:
+            self.action.fcurves.remove(fcurve)
+        return len(removed)
+
+
 # Remove all F-Curves from all actions that contain the target_string in their data_path
-def remove_fcurves_by_data_path(context, target_string):
+@profiled
+def remove_fcurves_by_data_path(context, target_string, fcurve_index=None):
     armature = context.active_object
-    if armature and armature.animation_data and armature.animation_data.action:
-        action = armature.animation_data.action
-        fcurves_to_remove = [fcurve for fcurve in action.fcurves if target_string in fcurve.data_path]
-        for fcurve in fcurves_to_remove:
-            action.fcurves.remove(fcurve)
-
-def find_and_remove_broken_fcurves(context, constraint_name_part="__Loca"):
+    if fcurve_index is None:
+        fcurve_index = FCurveIndex.from_object(armature)
+    if fcurve_index.action is None:
+        return 0
+    removed = 0
+    for bone_name in fcurve_index.bone_names():
+        if target_string in bone_name:
+            removed += fcurve_index.remove_bone_fcurves(bone_name)
+        else:
+            removed += fcurve_index.remove_bone_fcurves(bone_name, lambda channel: target_string in channel)
+    return removed + fcurve_index.remove_other_fcurves(lambda data_path: target_string in data_path)
+
+CONSTRAINT_CHANNEL = re.compile(r'^constraints\["((?:[^"\\]|\\.)*)"\]\.(\w+)$')
+CUSTOM_PROPERTY_CHANNEL = re.compile(r'^\["((?:[^"\\]|\\.)*)"\]$')
+
+def is_resolvable(obj, data_path):
+    try:
+        obj.path_resolve(data_path)
+    except ValueError:
+        return False
+    return True
+
+# Remove F-curves whose data path no longer resolves, return removed F-curves count
+@profiled
+def find_and_remove_broken_fcurves(context, constraint_name_part="__Loca", fcurve_index=None):
     obj = context.object
-    if obj.animation_data and obj.animation_data.action:
-        action = obj.animation_data.action
-        fcurves_to_remove = []
-
-        for fcurve in action.fcurves:
-            data_path = fcurve.data_path
-            if constraint_name_part in data_path:
-                fcurves_to_remove.append(fcurve)
-                continue                
-            try:
-                eval('obj.' + data_path)
-                obj.path_resolve(data_path)
-            except:
-                fcurves_to_remove.append(fcurve)
-        for fcurve in fcurves_to_remove:
-            action.fcurves.remove(fcurve)
-
-# Function to hide scale F-curves
-def hide_scale_fcurves(armature_name, bone_name='_LOCA'):
+    if fcurve_index is None:
+        fcurve_index = FCurveIndex.from_object(obj)
+    if fcurve_index.action is None:
+        return 0
+    pose_bone_props = {prop.identifier for prop in bpy.types.PoseBone.bl_rna.properties}
+    removed = 0
+
+    for bone_name in fcurve_index.bone_names():
+        pose_bone = obj.pose.bones.get(bone_name)
+        bone_path = f'pose.bones["{bpy.utils.escape_identifier(bone_name)}"].'
+        if pose_bone is None or constraint_name_part in bone_path:
+            removed += fcurve_index.remove_bone_fcurves(bone_name)
+            continue
+        constraints = {constraint.name: constraint for constraint in pose_bone.constraints}
+
+        def is_broken(channel):
+            if constraint_name_part in channel:
+                return True
+            if channel in pose_bone_props:
+                return False
+            match = CONSTRAINT_CHANNEL.match(channel)
+            if match:
+                constraint = constraints.get(bpy.utils.unescape_identifier(match.group(1)))
+                return constraint is None or match.group(2) not in constraint.bl_rna.properties
+            match = CUSTOM_PROPERTY_CHANNEL.match(channel)
+            if match:
+                return bpy.utils.unescape_identifier(match.group(1)) not in pose_bone.keys()
+            # Unusual paths are checked by Blender itself
+            return not is_resolvable(obj, bone_path + channel)
+
+        removed += fcurve_index.remove_bone_fcurves(bone_name, is_broken)
+
+    removed += fcurve_index.remove_other_fcurves(
+        lambda data_path: constraint_name_part in data_path or not is_resolvable(obj, data_path))
+    return removed
+
+# Function to hide scale F-curves of locators and of the given bones
+@profiled
+def hide_scale_fcurves(armature_name, bone_names=(), fcurve_index=None):
     armature = bpy.data.objects[armature_name]
-    if armature.animation_data and armature.animation_data.action:
-        for fcurve in armature.animation_data.action.fcurves:
-            if '_LOCA' in fcurve.data_path or bone_name in fcurve.data_path:
-                if 'scale' in fcurve.data_path:
-                    fcurve.hide = True
+    if fcurve_index is None:
+        fcurve_index = FCurveIndex.from_object(armature)
+    if isinstance(bone_names, str):
+        bone_names = [bone_names]
+    bone_names = set(bone_names)
+    for bone_name in fcurve_index.bone_names(lambda name: '_LOCA' in name or name in bone_names):
+        for fcurve in fcurve_index.fcurves(bone_name, lambda channel: channel == 'scale'):
+            fcurve.hide = True
+
+
+class LocatorRegistry:
+    """Per-armature index of locators, rebuilt lazily after the armature changes"""
+    entries = {}
 
+    # Index of an armature: locators with their source bone, type and constraints,
+    # and the bones driven by locators with the names of the driving constraints
+    @classmethod
+    def get(cls, armature):
+        entry = cls.entries.get(armature.name_full)
+        if entry is None:
+            entry = cls.entries[armature.name_full] = cls.build(armature)
+        return entry
+
+    @classmethod
+    def build(cls, armature):
+        locators = {}
+        driven_bones = {}
+        for pose_bone in armature.pose.bones:
+            if '_LOCA' in pose_bone.name:
+                source_name, _, suffix = pose_bone.name.partition('_LOCA')
+                locators[pose_bone.name] = {
+                    'source': source_name,
+                    'type': suffix.lstrip('_')[:2],
+                    'constraints': [(pose_bone.name, constraint.name) for constraint in pose_bone.constraints
+                                    if '_LOCA' in constraint.name],
+                }
+        for pose_bone in armature.pose.bones:
+            for constraint in pose_bone.constraints:
+                subtarget = getattr(constraint, 'subtarget', '')
+                if subtarget and '_LOCA_' in subtarget:
+                    driven_bones.setdefault(pose_bone.name, []).append(constraint.name)
+                    if subtarget in locators:
+                        locators[subtarget]['constraints'].append((pose_bone.name, constraint.name))
+        return {'locators': locators, 'driven_bones': driven_bones}
+
+    @classmethod
+    def invalidate(cls, armature=None):
+        if armature is None:
+            cls.entries.clear()
+        else:
+            cls.entries.pop(armature.name_full, None)
+
+
+@persistent
+def invalidate_locator_registry(*args):
+    LocatorRegistry.invalidate()
+
+@persistent
+def update_locator_registry(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Armature):
+            LocatorRegistry.invalidate()
+            return
+        if isinstance(update.id, bpy.types.Object) and update.id.type == 'ARMATURE':
+            LocatorRegistry.invalidate(update.id.original)
+
+
+BAKE_CHANNELS = {'LOCATION', 'ROTATION', 'SCALE'}
+
+# Create the action the bake keys are written to, like nla.bake with use_current_action
+def ensure_action(armature):
+    if armature.animation_data is None:
+        armature.animation_data_create()
+    if armature.animation_data.action is None:
+        armature.animation_data.action = bpy.data.actions.new("Action")
+    return armature.animation_data.action
+
+
+TRANSFORM_PROPS = ('location', 'rotation_quaternion', 'rotation_euler', 'rotation_axis_angle', 'scale')
+# Inverse kinematics settings of a pose bone, read by IK constraints of its chain
+IK_PROPS = ('ik_stretch', 'lock_ik_x', 'lock_ik_y', 'lock_ik_z', 'use_ik_limit_x', 'use_ik_limit_y', 'use_ik_limit_z',
+            'ik_min_x', 'ik_max_x', 'ik_min_y', 'ik_max_y', 'ik_min_z', 'ik_max_z',
+            'ik_stiffness_x', 'ik_stiffness_y', 'ik_stiffness_z', 'use_ik_rotation_control', 'ik_rotation_weight',
+            'use_ik_linear_control', 'ik_linear_weight')
+# Interface state stored with constraints and F-curve modifiers
+RNA_STATE_IGNORED = {'active', 'show_expanded'}
+
+# Settings of a constraint or F-curve modifier that affect the pose, with targets by name
+def rna_state(struct, animated=()):
+    values = []
+    for prop in struct.bl_rna.properties:
+        # Read-only values like IK errors are evaluation results, not settings
+        if prop.is_readonly and prop.type != 'COLLECTION':
+            continue
+        # Animated values depend on the current frame, their keys are part of the checksum
+        if prop.identifier in animated or prop.identifier in RNA_STATE_IGNORED:
+            continue
+        value = getattr(struct, prop.identifier)
+        if prop.type == 'POINTER':
+            value = getattr(value, 'name', None)
+        elif prop.type == 'COLLECTION':
+            # Constraint targets and envelope control points
+            value = [rna_state(item) for item in value]
+        elif prop.type in {'FLOAT', 'INT', 'BOOLEAN'} and getattr(prop, 'is_array', False):
+            value = tuple(value)
+        values.append((prop.identifier, value))
+    return values
+
+def constraint_targets(constraint):
+    targets = [getattr(constraint, 'target', None), getattr(constraint, 'pole_target', None)]
+    targets += [target.target for target in getattr(constraint, 'targets', ())]
+    return [target for target in targets if target is not None]
+
+# Checksum of the keys of a F-curve, reading only the attributes its segments are evaluated from
+def fcurve_checksum(fcurve, checksum):
+    keyframe_points = fcurve.keyframe_points
+    n_keys = len(keyframe_points)
+    checksum = zlib.crc32(repr((fcurve.data_path, fcurve.array_index, fcurve.mute, fcurve.extrapolation, n_keys,
+                                [rna_state(modifier) for modifier in fcurve.modifiers])).encode(), checksum)
+    interpolation = np.empty(n_keys, dtype=np.int32)
+    keyframe_points.foreach_get('interpolation', interpolation)
+    checksum = zlib.crc32(interpolation.tobytes(), checksum)
+    attributes = [('co', 2, np.float32), ('handle_left', 2, np.float32), ('handle_right', 2, np.float32)]
+    # Easing modes come after CONSTANT, LINEAR and BEZIER
+    if np.any(interpolation > INTERPOLATION_VALUES['BEZIER']):
+        attributes += [('easing', 1, np.int32), ('back', 1, np.float32), ('amplitude', 1, np.float32),
+                       ('period', 1, np.float32)]
+    for attr, size, dtype in attributes:
+        buffer = np.empty(n_keys * size, dtype=dtype)
+        keyframe_points.foreach_get(attr, buffer)
+        checksum = zlib.crc32(buffer.tobytes(), checksum)
+    return checksum
+
+# Checksum of everything the pose of an armature depends on: rest pose, pose position, IK settings, constraints,
+# keyframes and unkeyed transforms. None when the pose also depends on drivers, NLA strips or other objects.
+def pose_state_checksum(armature):
+    animation_data = armature.animation_data
+    if animation_data and (len(animation_data.drivers) or any(not track.mute for track in animation_data.nla_tracks)):
+        return None
+    rest = np.empty(len(armature.data.bones) * 16, dtype=np.float32)
+    armature.data.bones.foreach_get('matrix_local', rest)
+    checksum = zlib.crc32(rest.tobytes())
+    pose = armature.pose
+    state = [armature.data.pose_position, pose.ik_solver, rna_state(pose.ik_param) if pose.ik_param else None]
+    if animation_data:
+        state += [animation_data.action_extrapolation, animation_data.action_blend_type,
+                  animation_data.action_influence]
+    checksum = zlib.crc32(repr(state).encode(), checksum)
+
+    fcurve_index = FCurveIndex.from_object(armature)
+    for pose_bone in pose.bones:
+        bone = pose_bone.bone
+        state = [pose_bone.name, pose_bone.rotation_mode, bone.parent.name if bone.parent else None,
+                 bone.inherit_scale, bone.use_inherit_rotation, bone.use_local_location]
+        animated = {channel for channel, fcurve in fcurve_index.bone_fcurves.get(pose_bone.name, ())}
+        animated_constraint_props = {}
+        for channel in animated:
+            match = CONSTRAINT_CHANNEL.match(channel)
+            if match:
+                constraint_name = bpy.utils.unescape_identifier(match.group(1))
+                animated_constraint_props.setdefault(constraint_name, set()).add(match.group(2))
+        for constraint in pose_bone.constraints:
+            if any(target != armature for target in constraint_targets(constraint)):
+                return None
+            state.append(rna_state(constraint, animated_constraint_props.get(constraint.name, ())))
+        state += [(prop, tuple(getattr(pose_bone, prop))) for prop in TRANSFORM_PROPS if prop not in animated]
+        state += [(prop, getattr(pose_bone, prop)) for prop in IK_PROPS if prop not in animated]
+        checksum = zlib.crc32(repr(state).encode(), checksum)
+
+    if fcurve_index.action is not None:
+        for fcurve in fcurve_index.action.fcurves:
+            checksum = fcurve_checksum(fcurve, checksum)
+    return checksum
+
+
+POSE_CACHE_BLOCK_SIZE = 64
+
+class PoseCache:
+    """Pose matrices of all bones per frame and armature state, shared by bakes and scrubbing.
+    Memory is capped with least recently used frame blocks evicted first."""
+    blocks = OrderedDict()
+    size = 0
+    # State checksums for the frame change handler, dropped when the armature or its action is updated
+    states = {}
+    suspended = 0
+
+    @classmethod
+    def lookup(cls, armature, state, frame):
+        if int(frame) != frame:
+            return None
+        key = (armature.name_full, state, int(frame) // POSE_CACHE_BLOCK_SIZE)
+        block = cls.blocks.get(key)
+        if block is None or not block[1][int(frame) % POSE_CACHE_BLOCK_SIZE]:
+            return None
+        cls.blocks.move_to_end(key)
+        return block[0][int(frame) % POSE_CACHE_BLOCK_SIZE]
+
+    @classmethod
+    def store(cls, armature, state, frame, matrices, limit):
+        if int(frame) != frame or not limit:
+            return
+        key = (armature.name_full, state, int(frame) // POSE_CACHE_BLOCK_SIZE)
+        block = cls.blocks.get(key)
+        if block is None or block[0].shape[1] != len(matrices):
+            block = (np.empty((POSE_CACHE_BLOCK_SIZE,) + matrices.shape, dtype=np.float32),
+                     np.zeros(POSE_CACHE_BLOCK_SIZE, dtype=bool))
+            cls.size += block[0].nbytes - (cls.blocks[key][0].nbytes if key in cls.blocks else 0)
+            cls.blocks[key] = block
+        block[0][int(frame) % POSE_CACHE_BLOCK_SIZE] = matrices
+        block[1][int(frame) % POSE_CACHE_BLOCK_SIZE] = True
+        cls.blocks.move_to_end(key)
+        while cls.size > limit and cls.blocks:
+            evicted_key, (evicted, filled) = cls.blocks.popitem(last=False)
+            cls.size -= evicted.nbytes
+
+    @classmethod
+    def clear(cls):
+        cls.blocks.clear()
+        cls.states.clear()
+        cls.size = 0
+
+    # Keep frames evaluated while the pose is being changed out of the cache
+    @classmethod
+    @contextmanager
+    def suspend(cls):
+        cls.suspended += 1
+        try:
+            yield
+        finally:
+            cls.suspended -= 1
+
+
+class DiskPoseCache:
+    """Pose matrices of all bones per frame block and armature state saved as .npy files next to the
+    .blend, memory-mapped when read back. Frames not sampled yet are NaN. The directory size is capped
+    with least recently used files removed first."""
+    # Memory maps by file path, False for files known to be missing, least recently used first.
+    # Each map holds a file descriptor, so only the most recent ones stay open.
+    blocks = OrderedDict()
+    max_open = 64
+
+    @classmethod
+    def directory(cls, props):
+        path = props.disk_cache_dir
+        if path.startswith('//') and not bpy.data.filepath:
+            # Relative path of an unsaved file, which has no directory of its own
+            path = os.path.join(tempfile.gettempdir(), path[2:])
+        return os.path.normpath(bpy.path.abspath(path))
+
+    # Raised whenever pose_state_checksum gains inputs, so files saved under an older key are never read
+    key_version = 2
+
+    # Files are shared by every .blend using the same directory, the state checksum covers the rest pose,
+    # pose position, IK settings, constraints and keyframes the poses depend on. Files of other Blender
+    # versions are kept apart, as their evaluation may differ.
+    @classmethod
+    def block_path(cls, directory, armature, state, block_index):
+        owner = zlib.crc32(repr((cls.key_version, bpy.app.version, armature.name_full)).encode())
+        name = f"{owner:08x}_{state:08x}_{block_index:06d}.npy"
+        return os.path.join(directory, name)
+
+    @classmethod
+    def load(cls, path):
+        block = cls.blocks.get(path)
+        if block is None:
+            try:
+                block = np.load(path, mmap_mode='r')
+                os.utime(path)
+            except (OSError, ValueError):
+                block = False
+            cls.blocks[path] = block
+            while len(cls.blocks) > cls.max_open:
+                cls.blocks.popitem(last=False)
+        cls.blocks.move_to_end(path)
+        return block if block is not False else None
+
+    @classmethod
+    def lookup(cls, directory, armature, state, frame):
+        if int(frame) != frame:
+            return None
+        block = cls.load(cls.block_path(directory, armature, state, int(frame) // POSE_CACHE_BLOCK_SIZE))
+        if block is None or block.shape[1] != len(armature.pose.bones):
+            return None
+        pose = block[int(frame) % POSE_CACHE_BLOCK_SIZE]
+        if np.isnan(pose[0, 0, 0]):
+            return None
+        return np.array(pose)
+
+    @classmethod
+    def save(cls, directory, armature, state, frames, poses, limit):
+        blocks = {}
+        for frame, pose in zip(frames, poses):
+            if int(frame) == frame:
+                blocks.setdefault(int(frame) // POSE_CACHE_BLOCK_SIZE, []).append((int(frame), pose))
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"Loca disk cache error: {e}")
+            return
+        for block_index, entries in blocks.items():
+            path = cls.block_path(directory, armature, state, block_index)
+            shape = (POSE_CACHE_BLOCK_SIZE,) + entries[0][1].shape
+            block = cls.load(path)
+            data = np.array(block) if block is not None and block.shape == shape else np.full(shape, np.nan, np.float32)
+            for frame, pose in entries:
+                data[frame % POSE_CACHE_BLOCK_SIZE] = pose
+            # Release the memory map before the file is replaced
+            block = cls.blocks.pop(path, None)
+            del block
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, data)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"Loca disk cache error: {e}")
+        cls.evict(directory, limit)
+
+    @classmethod
+    def evict(cls, directory, limit):
+        try:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                     for entry in os.scandir(directory) if entry.name.endswith('.npy')]
+        except OSError:
+            return
+        size = sum(file_size for mtime, file_size, path in files)
+        for mtime, file_size, path in sorted(files):
+            if size <= limit:
+                break
+            cls.blocks.pop(path, None)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+
+    @classmethod
+    def clear(cls):
+        cls.blocks.clear()
+
+
+@persistent
+def invalidate_pose_cache(*args):
+    PoseCache.clear()
+    DiskPoseCache.clear()
+
+# Drop the state checksums of armatures whose object, bones or action were changed
+@persistent
+def update_pose_cache_states(scene, depsgraph):
+    if not PoseCache.states:
+        return
+    updated = {update.id.original for update in depsgraph.updates}
+    for name in list(PoseCache.states):
+        armature = bpy.data.objects.get(name)
+        action = armature.animation_data.action if armature and armature.animation_data else None
+        if armature is None or armature in updated or armature.data in updated or action in updated:
+            del PoseCache.states[name]
+
+# Cache the pose of the active armature on every frame the animator scrubs or plays
+@persistent
+def cache_scrubbed_pose(scene, *args):
+    props = scene.loca
+    armature = bpy.context.active_object
+    if (PoseCache.suspended or not props.pose_cache or scene.frame_subframe
+            or armature is None or armature.type != 'ARMATURE' or armature.mode != 'POSE'):
+        return
+    if armature.name_full not in PoseCache.states:
+        PoseCache.states[armature.name_full] = pose_state_checksum(armature)
+    state = PoseCache.states[armature.name_full]
+    if state is None or PoseCache.lookup(armature, state, scene.frame_current) is not None:
+        return
+    PoseCache.store(armature, state, scene.frame_current, transforms.read_matrices(armature.pose.bones),
+                    props.pose_cache_limit * 1024 * 1024)
+
+
+class PoseSampler:
+    """Sample the visual local (or pose space) matrices of pose bones, one scene evaluation per frame"""
+
+    # cache_state is the pose_state_checksum of the armature when the caller already has it
+    def __init__(self, context, armature, bone_names, frames, space='LOCAL', cache_state=False):
+        self.scene = context.scene
+        self.armature = armature
+        self.bone_names = list(bone_names)
+        self.frames = list(frames)
+        self.space = space
+        self.matrices = np.empty((len(self.frames), len(self.bone_names), 4, 4))
+        # Pose matrices are read in bulk and converted to local space in one call when the bones allow it
+        self.local_space = transforms.LocalSpace(armature, self.bone_names)
+        self.read_pose = space == 'POSE' or self.local_space.supported
+        if self.read_pose:
+            self.pose_matrices = np.empty((len(self.frames), len(self.local_space.indices), 4, 4))
+        props = getattr(self.scene, 'loca', None)
+        if not (self.read_pose and props is not None and props.pose_cache):
+            self.cache_state = None
+        else:
+            self.cache_state = pose_state_checksum(armature) if cache_state is False else cache_state
+            self.cache_limit = props.pose_cache_limit * 1024 * 1024
+        self.disk_cache = None
+        if self.cache_state is not None and props.disk_cache:
+            self.disk_cache = DiskPoseCache.directory(props)
+            self.disk_cache_limit = props.disk_cache_limit * 1024 * 1024
+            # Frames sampled without the disk cache, saved to it when sampling is finished
+            self.disk_frames = []
+            self.disk_poses = []
+        self.index = 0
+        self.frame_current = self.scene.frame_current
+        self.frame_subframe = self.scene.frame_subframe
+
+    @property
+    def done(self):
+        return self.index >= len(self.frames)
+
+    # Sample the next `count` frames (all remaining frames by default)
+    def step(self, count=None):
+        pose_bones = [self.armature.pose.bones[name] for name in self.bone_names]
+        convert_space = self.armature.convert_space
+        stop = len(self.frames) if count is None else min(self.index + count, len(self.frames))
+        frames_evaluated = 0
+        disk_cache_hits = 0
+        with profile_stage('sample_poses'):
+            for i in range(self.index, stop):
+                frame = self.frames[i]
+                if self.read_pose:
+                    pose = None
+                    if self.cache_state is not None:
+                        pose = PoseCache.lookup(self.armature, self.cache_state, frame)
+                        if pose is None and self.disk_cache is not None:
+                            pose = DiskPoseCache.lookup(self.disk_cache, self.armature, self.cache_state, frame)
+                            if pose is not None:
+                                disk_cache_hits += 1
+                                PoseCache.store(self.armature, self.cache_state, frame, pose, self.cache_limit)
+                        elif self.disk_cache is not None and DiskPoseCache.lookup(
+                                self.disk_cache, self.armature, self.cache_state, frame) is None:
+                            self.disk_frames.append(frame)
+                            self.disk_poses.append(pose)
+                    if pose is None:
+                        self.scene.frame_set(frame)
+                        frames_evaluated += 1
+                        pose = transforms.read_matrices(self.armature.pose.bones)
+                        if self.cache_state is not None:
+                            PoseCache.store(self.armature, self.cache_state, frame, pose, self.cache_limit)
+                        if self.disk_cache is not None:
+                            self.disk_frames.append(frame)
+                            self.disk_poses.append(pose)
+                    self.pose_matrices[i] = pose[self.local_space.indices]
+                    continue
+                self.scene.frame_set(frame)
+                frames_evaluated += 1
+                for j, pose_bone in enumerate(pose_bones):
+                    self.matrices[i, j] = convert_space(
+                        pose_bone=pose_bone, matrix=pose_bone.matrix, from_space='POSE', to_space='LOCAL')
+        profile_count('frames_evaluated', frames_evaluated)
+        profile_count('pose_cache_hits', stop - self.index - frames_evaluated)
+        profile_count('disk_cache_hits', disk_cache_hits)
+        self.index = stop
+        return self.done
+
+    def finish(self):
+        self.scene.frame_set(self.frame_current, subframe=self.frame_subframe)
+        if self.disk_cache is not None and self.disk_frames:
+            with profile_stage('disk_cache_save'):
+                DiskPoseCache.save(self.disk_cache, self.armature, self.cache_state,
+                                   self.disk_frames, self.disk_poses, self.disk_cache_limit)
+            self.disk_frames, self.disk_poses = [], []
+        if self.disk_cache is not None:
+            # Close the maps of this bake, later bakes reopen what they need
+            DiskPoseCache.clear()
+        if self.read_pose and self.index:
+            pose_matrices = self.pose_matrices[:self.index]
+            if self.space == 'POSE':
+                self.matrices[:self.index] = pose_matrices[:, :len(self.bone_names)]
+            else:
+                self.matrices[:self.index] = self.local_space.to_local(pose_matrices)
+        return self.matrices
+
+
+# Convert sampled basis matrices of one bone to channel values, the way nla.bake does
+def decompose_basis_matrices(matrices, rotation_mode):
+    location, rotation, scale = transforms.decompose_channels(matrices, rotation_mode)
+    rotation_path = {'QUATERNION': 'rotation_quaternion', 'AXIS_ANGLE': 'rotation_axis_angle'}.get(
+        rotation_mode, 'rotation_euler')
+    return [('location', 'LOCATION', location), (rotation_path, 'ROTATION', rotation), ('scale', 'SCALE', scale)]
+
+
+# Keyframe attributes kept when keys are rewritten in bulk, with their size per key and defaults for new keys
+KEYFRAME_ATTRIBUTES = (
+    ('handle_left', 2, float, 0.0),
+    ('handle_right', 2, float, 0.0),
+    ('interpolation', 1, np.int32, 2),  # BEZIER
+    ('handle_left_type', 1, np.int32, 4),  # AUTO_CLAMPED
+    ('handle_right_type', 1, np.int32, 4),
+    ('easing', 1, np.int32, 0),  # AUTO
+    ('type', 1, np.int32, 0),  # KEYFRAME
+    # Parameters of the BACK and ELASTIC easing modes, with the defaults of new keys
+    ('back', 1, float, 1.70158),
+    ('amplitude', 1, float, 0.8),
+    ('period', 1, float, 4.1),
+)
+INTERPOLATION_VALUES = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+
+# Read all keyframes of a F-curve into co and attribute buffers
+def read_keyframes(fcurve):
+    keyframe_points = fcurve.keyframe_points
+    n_keys = len(keyframe_points)
+    co = np.empty(n_keys * 2)
+    keyframe_points.foreach_get('co', co)
+    attributes = {}
+    for attr, size, dtype, default in KEYFRAME_ATTRIBUTES:
+        buffer = np.empty(n_keys * size, dtype=dtype)
+        keyframe_points.foreach_get(attr, buffer)
+        attributes[attr] = buffer.reshape(n_keys, size)
+    return co.reshape(n_keys, 2), attributes
+
+# Replace all keyframes of a F-curve with the given buffers
+def set_keyframes(fcurve, co, attributes):
+    keyframe_points = fcurve.keyframe_points
+    if len(keyframe_points):
+        keyframe_points.clear()
+    keyframe_points.add(len(co))
+    keyframe_points.foreach_set('co', np.ascontiguousarray(co).ravel())
+    for attr, buffer in attributes.items():
+        keyframe_points.foreach_set(attr, np.ascontiguousarray(buffer).ravel())
+    # Sort keys and recalculate handles once for the whole curve
+    fcurve.update()
+
+# Write (frame, value) pairs to a F-curve in bulk, replacing existing keys on the same frames
+# and, with replace_range, all existing keys in that frame range
+def write_fcurve_keys(fcurve, frames, values, interpolation=None, replace_range=None):
+    frames = np.asarray(frames, dtype=float)
+    n_keys = len(frames)
+    profile_count('keys_written', n_keys)
+    co = np.empty((n_keys, 2))
+    co[:, 0] = frames
+    co[:, 1] = values
+    attributes = {attr: np.full((n_keys, size), default, dtype=dtype)
+                  for attr, size, dtype, default in KEYFRAME_ATTRIBUTES}
+    if interpolation is not None:
+        attributes['interpolation'][:] = INTERPOLATION_VALUES[interpolation]
+
+    if len(fcurve.keyframe_points):
+        existing_co, existing_attributes = read_keyframes(fcurve)
+        keep = ~np.isin(existing_co[:, 0], frames)
+        if replace_range is not None:
+            keep &= (existing_co[:, 0] < replace_range[0]) | (existing_co[:, 0] > replace_range[1])
+        co = np.concatenate((existing_co[keep], co))
+        attributes = {attr: np.concatenate((existing_attributes[attr][keep], buffer))
+                      for attr, buffer in attributes.items()}
+
+    set_keyframes(fcurve, co, attributes)
+    return fcurve
+
+
+# Write a (n_frames x channels) buffer to the F-curves of a data path, creating missing curves
+def write_fcurve_channels(action, data_path, group_name, frames, buffer, interpolation=None, replace_range=None):
+    buffer = np.asarray(buffer, dtype=float).reshape(len(frames), -1)
+    fcurves = []
+    for index in range(buffer.shape[1]):
+        fcurve = action.fcurves.find(data_path, index=index)
+        if fcurve is None:
+            fcurve = action.fcurves.new(data_path, index=index, action_group=group_name)
+        fcurves.append(write_fcurve_keys(fcurve, frames, buffer[:, index], interpolation, replace_range))
+    return fcurves
+
+
+@profiled
+def write_baked_matrices(armature, bone_names, frames, matrices, channel_types=BAKE_CHANNELS,
+                         interpolation=None, replace_range=None):
+    action = ensure_action(armature)
+    # Bones sharing a rotation mode are decomposed together
+    rotation_mode_columns = {}
+    for j, bone_name in enumerate(bone_names):
+        rotation_mode_columns.setdefault(armature.pose.bones[bone_name].rotation_mode, []).append(j)
+    for rotation_mode, columns in rotation_mode_columns.items():
+        for prop, channel_type, values in decompose_basis_matrices(matrices[:, columns], rotation_mode):
+            if channel_type not in channel_types:
+                continue
+            for j, bone_values in zip(columns, np.moveaxis(values, 1, 0)):
+                data_path = f'pose.bones["{bpy.utils.escape_identifier(bone_names[j])}"].{prop}'
+                write_fcurve_channels(action, data_path, bone_names[j], frames, bone_values,
+                                      interpolation, replace_range)
+
+
+# Ramer-Douglas-Peucker: mark the points needed to keep a polyline within tolerance of the values
+def simplify_polyline(x, y, tolerance):
+    keep = np.zeros(len(x), dtype=bool)
+    keep[0] = keep[-1] = True
+    segments = [(0, len(x) - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        t = (x[start + 1:end] - x[start]) / (x[end] - x[start])
+        error = np.abs(y[start + 1:end] - (y[start] + t * (y[end] - y[start])))
+        i = int(np.argmax(error))
+        if error[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            segments += [(start, split), (split, end)]
+    return keep
+
+# Remove a static F-curve entirely or decimate its keys inside the frame range, return removed keys count
+def reduce_fcurve(armature, action, fcurve, tolerance, st_frame, end_frame):
+    co, attributes = read_keyframes(fcurve)
+    n_keys = len(co)
+    if n_keys and np.ptp(co[:, 1]) <= tolerance:
+        data_path, index = fcurve.data_path, fcurve.array_index
+        action.fcurves.remove(fcurve)
+        armature.path_resolve(data_path)[index] = co[0, 1]
+        return n_keys
+
+    in_range = np.flatnonzero((co[:, 0] >= st_frame) & (co[:, 0] <= end_frame))
+    if len(in_range) < 3:
+        return 0
+    keep = np.ones(n_keys, dtype=bool)
+    keep[in_range] = simplify_polyline(co[in_range, 0], co[in_range, 1], tolerance)
+    kept = np.flatnonzero(keep)
+    if len(kept) == n_keys:
+        return 0
+    # Keys followed by removed keys interpolate linearly, so the curve stays within tolerance
+    attributes['interpolation'][kept[:-1][np.diff(kept) > 1]] = INTERPOLATION_VALUES['LINEAR']
+    set_keyframes(fcurve, co[keep], {attr: buffer[keep] for attr, buffer in attributes.items()})
+    return n_keys - len(kept)
+
+REDUCE_TOLERANCE_PROPS = {
+    'location': 'reduce_tolerance_location',
+    'rotation_quaternion': 'reduce_tolerance_rotation',
+    'rotation_euler': 'reduce_tolerance_rotation',
+    'rotation_axis_angle': 'reduce_tolerance_rotation',
+    'scale': 'reduce_tolerance_scale',
+}
+
+# Reduce keys on the transform F-curves of baked bones, return removed keys count
+@profiled
+def reduce_baked_fcurves(armature, bone_names, st_frame, end_frame, props):
+    if not armature.animation_data or not armature.animation_data.action:
+        return 0
+    action = armature.animation_data.action
+    fcurve_index = FCurveIndex(action)
+    keys_removed = 0
+    for bone_name in set(bone_names):
+        for prop, fcurve in fcurve_index.bone_fcurves.get(bone_name, ()):
+            if prop in REDUCE_TOLERANCE_PROPS:
+                tolerance = getattr(props, REDUCE_TOLERANCE_PROPS[prop])
+                keys_removed += reduce_fcurve(armature, action, fcurve, tolerance, st_frame, end_frame)
+    return keys_removed
+
+
+BAKE_BLOCK_SIZE = 8
+BAKE_BLOCK_MARGIN = 2
+
+# Checksum per frame block of the keys that shape the F-curves of the given bones inside that block
+def bake_block_checksums(fcurve_index, bone_names, st_frame, end_frame):
+    n_blocks = (end_frame - st_frame) // BAKE_BLOCK_SIZE + 1
+    checksums = [0] * n_blocks
+    fcurves = [fcurve for bone_name in set(bone_names) for fcurve in fcurve_index.fcurves(bone_name)]
+    fcurves.sort(key=lambda fcurve: (fcurve.data_path, fcurve.array_index))
+    block_starts = st_frame + np.arange(n_blocks) * BAKE_BLOCK_SIZE
+    for fcurve in fcurves:
+        co, attributes = read_keyframes(fcurve)
+        keys = np.column_stack((co, attributes['handle_left'], attributes['handle_right'],
+                                attributes['interpolation']))
+        # Each block also covers the keys around it, which shape the curve segments crossing the block
+        lo = np.maximum(np.searchsorted(co[:, 0], block_starts, side='left') - 1, 0)
+        hi = np.searchsorted(co[:, 0], block_starts + BAKE_BLOCK_SIZE - 1, side='right') + 1
+        curve_id = f'{fcurve.data_path}[{fcurve.array_index}]'.encode()
+        for block in range(n_blocks):
+            checksums[block] = zlib.crc32(curve_id + keys[lo[block]:hi[block]].tobytes(), checksums[block])
+    # Keep checksums within the range of integer ID properties
+    return [checksum & 0x7fffffff for checksum in checksums]
+
+# Names of the bones whose F-curves decide the pose of a transform locator and its source bone
+def bake_snapshot_bone_names(armature, locator_name, bone_name):
+    return [locator_name, bone_name] + [parent.name for parent in armature.data.bones[bone_name].parent_recursive]
+
+# Checksum of what shapes the bones besides their keys: rest matrices, rotation modes and un-keyed transforms
+def bake_snapshot_state(armature, bone_names, fcurve_index):
+    state = []
+    for bone_name in bone_names:
+        pose_bone = armature.pose.bones[bone_name]
+        keyed = {(channel, fcurve.array_index) for channel, fcurve in fcurve_index.bone_fcurves.get(bone_name, ())}
+        state.append((bone_name, pose_bone.rotation_mode, [tuple(row) for row in pose_bone.bone.matrix_local]))
+        for prop in TRANSFORM_PROPS:
+            state += [(prop, index, value) for index, value in enumerate(getattr(pose_bone, prop))
+                      if (prop, index) not in keyed]
+    # Keep the checksum within the range of integer ID properties
+    return zlib.crc32(repr(state).encode()) & 0x7fffffff
+
+# Remember the state of the keys a source bone will be baked from
+def store_bake_snapshot(armature, locator_name, bone_name, st_frame, end_frame, fcurve_index):
+    bone_names = bake_snapshot_bone_names(armature, locator_name, bone_name)
+    locator = armature.data.bones[locator_name]
+    locator["loca_bake_range"] = [st_frame, end_frame]
+    locator["loca_bake_state"] = bake_snapshot_state(armature, bone_names, fcurve_index)
+    locator["loca_bake_blocks"] = bake_block_checksums(fcurve_index, bone_names, st_frame, end_frame)
+
+# Frames of the range that changed since the locator was baked,
+# None when the bone has to be baked in full
+def incremental_bake_frames(armature, bone_name, st_frame, end_frame, fcurve_index):
+    pose_bone = armature.pose.bones[bone_name]
+    constraints = list(pose_bone.constraints)
+    if (len(constraints) != 1 or constraints[0].type != 'COPY_TRANSFORMS'
+            or '_LOCA' not in constraints[0].name or constraints[0].subtarget not in armature.data.bones):
+        return None
+    if any(parent_P.constraints for parent_P in pose_bone.parent_recursive):
+        return None
+    locator_name = constraints[0].subtarget
+    # Constraints or a parent added to the locator move it without touching any key
+    locator_P = armature.pose.bones[locator_name]
+    if locator_P.constraints or locator_P.parent:
+        return None
+    bone_names = bake_snapshot_bone_names(armature, locator_name, bone_name)
+    animation_data = armature.animation_data
+    if animation_data and (any(not track.mute for track in animation_data.nla_tracks)
+                           or any(split_bone_data_path(driver.data_path)[0] in bone_names
+                                  for driver in animation_data.drivers)):
+        return None
+
+    locator = armature.data.bones[locator_name]
+    if list(locator.get("loca_bake_range", ())) != [st_frame, end_frame]:
+        return None
+    if locator.get("loca_bake_state") != bake_snapshot_state(armature, bone_names, fcurve_index):
+        return None
+    stored = list(locator.get("loca_bake_blocks", ()))
+    current = bake_block_checksums(fcurve_index, bone_names, st_frame, end_frame)
+    if len(stored) != len(current):
+        return None
+    dirty = np.zeros(end_frame - st_frame + 1, dtype=bool)
+    for block, (stored_checksum, checksum) in enumerate(zip(stored, current)):
+        if stored_checksum != checksum:
+            start = max(block * BAKE_BLOCK_SIZE - BAKE_BLOCK_MARGIN, 0)
+            dirty[start:(block + 1) * BAKE_BLOCK_SIZE + BAKE_BLOCK_MARGIN] = True
+    return np.flatnonzero(dirty) + st_frame
+
+# Basis matrices of a pose bone computed from its F-curves, without evaluating the scene
+def evaluate_basis_matrices(armature, bone_name, frames):
+    pose_bone = armature.pose.bones[bone_name]
+    action = armature.animation_data.action
+    rotation_mode = pose_bone.rotation_mode
+    rotation_path = {'QUATERNION': 'rotation_quaternion', 'AXIS_ANGLE': 'rotation_axis_angle'}.get(
+        rotation_mode, 'rotation_euler')
+    bone_path = f'pose.bones["{bpy.utils.escape_identifier(bone_name)}"].'
+    channels = []
+    for prop in ('location', rotation_path, 'scale'):
+        current = getattr(pose_bone, prop)
+        values = np.empty((len(frames), len(current)))
+        for index, value in enumerate(current):
+            fcurve = action.fcurves.find(bone_path + prop, index=index)
+            values[:, index] = [fcurve.evaluate(frame) for frame in frames] if fcurve else value
+        channels.append(values)
+    return transforms.compose_channels(*channels, rotation_mode)
+
+# Resample only the changed frames of each bone and rebuild the other frames from its F-curves
+@profiled
+def bake_bones_incremental(context, armature, bones_dirty_frames, st_frame, end_frame):
+    bone_names = list(bones_dirty_frames)
+    dirty_frames = np.unique(np.concatenate(list(bones_dirty_frames.values())))
+    sampler = PoseSampler(context, armature, bone_names, dirty_frames.tolist())
+    sampler.step()
+    sampled = sampler.finish()
+
+    frames = np.arange(st_frame, end_frame + 1)
+    matrices = np.empty((len(frames), len(bone_names), 4, 4))
+    for j, bone_name in enumerate(bone_names):
+        bone_dirty_frames = bones_dirty_frames[bone_name]
+        clean_frames = np.setdiff1d(frames, bone_dirty_frames)
+        matrices[clean_frames - st_frame, j] = evaluate_basis_matrices(armature, bone_name, clean_frames.tolist())
+        matrices[bone_dirty_frames - st_frame, j] = sampled[np.searchsorted(dirty_frames, bone_dirty_frames), j]
+    write_baked_matrices(armature, bone_names, frames, matrices)
+
+
+PARALLEL_MIN_CHUNK_FRAMES = 200
+
+# Start a background Blender process sampling one frame chunk of a saved copy of the scene
+def start_bake_worker(context, blend_path, armature, bone_names, frames, output_path):
+    # Frame lists of long chunks don't fit in a command line argument, the job is passed as a file
+    job_path = os.path.splitext(output_path)[0] + ".json"
+    with open(job_path, 'w') as f:
+        json.dump({'armature': armature.name, 'bones': list(bone_names), 'frames': list(frames),
+                   'output': output_path}, f)
+    command = [bpy.app.binary_path, '--background', '--factory-startup']
+    if context.preferences.filepaths.use_scripts_auto_execute:
+        command.append('--enable-autoexec')
+    command += [blend_path, '--python', os.path.join(os.path.dirname(__file__), 'bake_worker.py'),
+                '--', job_path]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+# Sample pose matrices in frame chunks with background Blender processes, return None when the range
+# has to be sampled serially. Every chunk start is checked against a serial evaluation of the frame
+# following its predecessor, so scenes whose pose depends on evaluation history never bake differently.
+@profiled
+def sample_poses_parallel(context, armature, bone_names, frames, workers):
+    frames = list(frames)
+    n_chunks = min(workers, len(frames) // PARALLEL_MIN_CHUNK_FRAMES)
+    if n_chunks < 2:
+        return None
+    # Workers return raw pose matrices, converted to local space here
+    local_space = transforms.LocalSpace(armature, bone_names)
+    if not local_space.supported:
+        return None
+    # Frames all in the pose cache are read back faster by the serial sampler
+    props = context.scene.loca
+    if props.pose_cache:
+        state = pose_state_checksum(armature)
+        disk_cache = DiskPoseCache.directory(props) if props.disk_cache else None
+        if state is not None and all(
+                PoseCache.lookup(armature, state, frame) is not None
+                or (disk_cache is not None and DiskPoseCache.lookup(disk_cache, armature, state, frame) is not None)
+                for frame in frames):
+            return None
+    chunk_starts = [len(chunk) for chunk in np.array_split(np.arange(len(frames)), n_chunks)]
+    chunk_starts = np.cumsum([0] + chunk_starts[:-1]).tolist()
+    chunk_bounds = list(zip(chunk_starts, chunk_starts[1:] + [len(frames)]))
+
+    with tempfile.TemporaryDirectory(prefix="loca_bake_") as temp_dir:
+        blend_path = os.path.join(temp_dir, "bake.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True, check_existing=False)
+        output_paths = [os.path.join(temp_dir, f"chunk_{i}.npy") for i in range(n_chunks)]
+        processes = []
+        try:
+            for (start, stop), output_path in zip(chunk_bounds, output_paths):
+                processes.append(start_bake_worker(
+                    context, blend_path, armature, bone_names, frames[start:stop], output_path))
+        except OSError as e:
+            for process in processes:
+                process.kill()
+                process.communicate()
+            show_message_box(f"Parallel bake failed, baking serially: {e}", "Warning", 'ERROR')
+            return None
+
+        # Sample the boundary frames in this session while the workers run
+        check_indices = [index for start in chunk_starts[1:] for index in (start - 1, start)]
+        sampler = PoseSampler(context, armature, bone_names, [frames[index] for index in check_indices], space='POSE')
+        sampler.step()
+        sampler.finish()
+        serial = sampler.pose_matrices.astype(np.float32)
+
+        errors = []
+        for process in processes:
+            _, stderr = process.communicate()
+            if process.returncode:
+                errors.append(stderr.strip().splitlines()[-1] if stderr.strip() else f"exit code {process.returncode}")
+        if errors or not all(os.path.exists(path) for path in output_paths):
+            show_message_box(f"Parallel bake failed, baking serially: {errors[0] if errors else 'no result'}",
+                             "Warning", 'ERROR')
+            return None
+        pose_matrices = np.concatenate([np.load(path) for path in output_paths])
+
+    profile_count('frames_evaluated', len(frames) + len(check_indices))
+    if pose_matrices.shape[1:] != serial.shape[1:] or not np.array_equal(
+            pose_matrices[check_indices[1::2]], serial[1::2]):
+        profile_count('parallel_boundary_mismatches')
+        return None
+    return local_space.to_local(pose_matrices.astype(float))
+
+CHANNEL_TYPES = ('LOCATION', 'ROTATION', 'SCALE')
+
+class AdaptiveBakeStats:
+    """Frames sampled and largest interpolation error of adaptive bakes since the last report"""
+    frames_sampled = 0
+    frames_total = 0
+    max_errors = np.zeros(len(CHANNEL_TYPES))
+
+    @classmethod
+    def add(cls, frames_sampled, frames_total, max_errors):
+        cls.frames_sampled += frames_sampled
+        cls.frames_total += frames_total
+        cls.max_errors = np.maximum(cls.max_errors, max_errors)
+
+    @classmethod
+    def consume_message(cls):
+        if not cls.frames_total:
+            return ''
+        location, rotation, scale = cls.max_errors
+        message = (f', {cls.frames_sampled}/{cls.frames_total} frames sampled, max error location {location:.2g},'
+                   f' rotation {rotation:.2g}, scale {scale:.2g}')
+        cls.frames_sampled = cls.frames_total = 0
+        cls.max_errors = np.zeros(len(CHANNEL_TYPES))
+        return message
+
+# Keyframes of the bones the pose of baked bones depends on, and the last frame before each constant
+# step, as starting frames of an adaptive bake
+def adaptive_seed_frames(armature, bone_names, st_frame, end_frame):
+    pose_bones = armature.pose.bones
+    chain = set()
+    stack = list(bone_names)
+    while stack:
+        bone_name = stack.pop()
+        if bone_name in chain or bone_name not in pose_bones:
+            continue
+        chain.add(bone_name)
+        pose_bone = pose_bones[bone_name]
+        stack += [parent_P.name for parent_P in pose_bone.parent_recursive]
+        stack += [constraint.subtarget for constraint in pose_bone.constraints
+                  if getattr(constraint, 'subtarget', '') and armature in constraint_targets(constraint)]
+
+    frames = {st_frame, end_frame}
+    fcurve_index = FCurveIndex.from_object(armature)
+    for bone_name in chain:
+        for fcurve in fcurve_index.fcurves(bone_name):
+            co, attributes = read_keyframes(fcurve)
+            keyed = np.round(co[:, 0]).astype(int)
+            constant = attributes['interpolation'][:-1, 0] == INTERPOLATION_VALUES['CONSTANT']
+            for frame in np.concatenate((keyed, keyed[1:][constant] - 1)).tolist():
+                if st_frame <= frame <= end_frame:
+                    frames.add(frame)
+    return sorted(frames)
+
+# Interpolation error per channel type at probe frames, for linear keys at the given start and stop frames.
+# Rotations are decomposed over all sampled frames in order, with the continuity of the written keys.
+def linear_interpolation_errors(samples, rotation_mode_columns, starts, stops, probes):
+    frames = sorted(samples)
+    position = {frame: i for i, frame in enumerate(frames)}
+    start = np.array([position[frame] for frame in starts], dtype=int)
+    stop = np.array([position[frame] for frame in stops], dtype=int)
+    probe = np.array([position[frame] for frame in probes], dtype=int)
+    t = ((np.array(probes) - np.array(starts)) / (np.array(stops) - np.array(starts)))[:, None, None]
+    matrices = np.stack([samples[frame] for frame in frames])
+    errors = np.zeros((len(probes), len(CHANNEL_TYPES)))
+    for rotation_mode, columns in rotation_mode_columns.items():
+        channels = decompose_basis_matrices(matrices[:, columns], rotation_mode)
+        for c, (prop, channel_type, values) in enumerate(channels):
+            interpolated = values[start] * (1 - t) + values[stop] * t
+            errors[:, c] = np.maximum(errors[:, c], np.abs(values[probe] - interpolated).max(axis=(1, 2)))
+    return errors
+
+# Interior frames checked before an interval between two keys is accepted: its quarter points,
+# so that eased motion, which crosses the straight line at the midpoint, is still caught
+def adaptive_probe_frames(st_frame, end_frame):
+    return sorted({st_frame + (end_frame - st_frame) * k // 4 for k in (1, 2, 3)} - {st_frame, end_frame})
+
+# Sample a frame range sparsely: start with keys at the seed frames, probe the interior of each interval
+# between keys and split it at its midpoint until linear interpolation matches the pose at every probe
+# within the reduction tolerances. Return the key frames, their local matrices, the number of frames
+# sampled and the largest error per channel type of the keys at any sampled frame.
+@profiled
+def sample_poses_adaptive(context, armature, bone_names, st_frame, end_frame, channel_types, props):
+    tolerances = np.array([getattr(props, REDUCE_TOLERANCE_PROPS[prop])
+                           for prop in ('location', 'rotation_euler', 'scale')])
+    checked = np.array([channel_type in channel_types for channel_type in CHANNEL_TYPES])
+    rotation_mode_columns = {}
+    for j, bone_name in enumerate(bone_names):
+        rotation_mode_columns.setdefault(armature.pose.bones[bone_name].rotation_mode, []).append(j)
+
+    samples = {}
+    new_frames = adaptive_seed_frames(armature, bone_names, st_frame, end_frame)
+    keys = set(new_frames)
+    pending = None
+    # The armature doesn't change between rounds, its state is computed by the first sampler only
+    cache_state = False
+    while pending is None or pending:
+        if new_frames:
+            sampler = PoseSampler(context, armature, bone_names, new_frames, cache_state=cache_state)
+            cache_state = sampler.cache_state
+            sampler.step()
+            samples.update(zip(new_frames, sampler.finish()))
+
+        if pending is None:
+            frames = sorted(samples)
+            pending = list(zip(frames, frames[1:]))
+        else:
+            probed = [(i, a, b, frame) for i, (a, b) in enumerate(pending) for frame in adaptive_probe_frames(a, b)]
+            intervals, starts, stops, probes = zip(*probed)
+            errors = linear_interpolation_errors(samples, rotation_mode_columns, starts, stops, probes)
+            refine = np.zeros(len(pending), dtype=bool)
+            np.logical_or.at(refine, np.array(intervals), np.any((errors > tolerances) & checked, axis=1))
+            split = [interval for interval, needs_split in zip(pending, refine) if needs_split]
+            keys.update((a + b) // 2 for a, b in split)
+            pending = [(a, (a + b) // 2) for a, b in split] + [((a + b) // 2, b) for a, b in split]
+
+        pending = [(a, b) for a, b in pending if b - a > 1]
+        # Probes of split intervals may have been sampled in an earlier round already
+        new_frames = sorted({frame for a, b in pending for frame in adaptive_probe_frames(a, b)} - samples.keys())
+
+    keys = sorted(keys)
+    # Error of the written keys at every sampled frame, not only at the probes of the last round
+    max_errors = np.zeros(len(CHANNEL_TYPES))
+    if len(keys) > 1:
+        sampled = sorted(samples)
+        index = np.clip(np.searchsorted(keys, sampled, side='right') - 1, 0, len(keys) - 2)
+        errors = linear_interpolation_errors(samples, rotation_mode_columns, [keys[i] for i in index],
+                                             [keys[i + 1] for i in index], sampled)
+        max_errors = errors.max(axis=0) * checked
+    return keys, np.stack([samples[frame] for frame in keys]), len(samples), max_errors
+
+# Write the location track of a locator that keeps its current offset from a bone, like a baked
+# CHILD_OF constraint, from one sampling pass of the bone. Locators are root bones, so their basis
+# is their pose matrix relative to their rest matrix. Return the keys removed by key reduction.
+@profiled
+def bake_offset_locator(context, armature, locator_name, bone_name, st_frame, end_frame):
+    props = context.scene.loca
+    pose_bones = armature.pose.bones
+    locator_P = pose_bones[locator_name]
+    context.view_layer.update()
+    offset = transforms.invert(np.array(pose_bones[bone_name].matrix)) @ np.array(locator_P.matrix)
+
+    # Key the current location first, it stays outside of the bake range
+    action = ensure_action(armature)
+    data_path = f'pose.bones["{bpy.utils.escape_identifier(locator_name)}"].location'
+    write_fcurve_channels(action, data_path, locator_name, [context.scene.frame_current], [tuple(locator_P.location)])
+
+    frames = range(st_frame, end_frame + 1)
+    with isolate_bake(context, armature, [bone_name]), PoseCache.suspend():
+        sampler = PoseSampler(context, armature, [bone_name], frames, space='POSE')
+        sampler.step()
+        bone_matrices = sampler.finish()[:, 0]
+    basis = transforms.invert(np.array(locator_P.bone.matrix_local)) @ bone_matrices @ offset
+    write_fcurve_channels(action, data_path, locator_name, frames, basis[:, :3, 3])
+
+    if props.reduce_keys:
+        return reduce_baked_fcurves(armature, [locator_name], st_frame, end_frame, props)
+    return 0
+
+# Objects the pose of an armature depends on: parents, constraint and modifier targets and driver
+# variable targets, followed recursively. None when a scripted driver may read anything.
+def object_dependencies(armature):
+    needed = {}
+    stack = [armature]
+    while stack:
+        obj = stack.pop()
+        if obj is None or obj.name_full in needed:
+            continue
+        needed[obj.name_full] = obj
+        stack.append(obj.parent)
+        constraints = list(obj.constraints)
+        if obj.type == 'ARMATURE':
+            constraints += [constraint for pose_bone in obj.pose.bones for constraint in pose_bone.constraints]
+        for constraint in constraints:
+            stack += constraint_targets(constraint)
+        for modifier in obj.modifiers:
+            stack.append(getattr(modifier, 'object', None))
+            if modifier.type == 'NODES':
+                stack += [value for value in modifier.values() if isinstance(value, bpy.types.Object)]
+        for id_data in (obj, obj.data):
+            animation_data = getattr(id_data, 'animation_data', None)
+            if animation_data is None:
+                continue
+            for fcurve in animation_data.drivers:
+                driver = fcurve.driver
+                if driver.type == 'SCRIPTED' and not driver.is_simple_expression:
+                    return None
+                for variable in driver.variables:
+                    for target in variable.targets:
+                        if isinstance(target.id, bpy.types.Object):
+                            stack.append(target.id)
+                        elif target.id is not None:
+                            stack += [user for user in bpy.data.objects if user.data == target.id]
+    return set(needed)
+
+def constraint_subtargets(armature, constraint):
+    subtargets = []
+    if getattr(constraint, 'target', None) == armature:
+        subtargets.append(getattr(constraint, 'subtarget', ''))
+    if getattr(constraint, 'pole_target', None) == armature:
+        subtargets.append(constraint.pole_subtarget)
+    subtargets += [target.subtarget for target in getattr(constraint, 'targets', ()) if target.target == armature]
+    return [subtarget for subtarget in subtargets if subtarget]
+
+IK_CONSTRAINTS = {'IK', 'SPLINE_IK'}
+
+# Bones the pose of `bone_names` depends on: parents, constraint subtargets in the armature and bones
+# whose IK chains reach into them. None when drivers may tie any bone to any other.
+def bone_dependencies(armature, bone_names):
+    for id_data in (armature, armature.data):
+        if id_data.animation_data and len(id_data.animation_data.drivers):
+            return None
+    pose_bones = armature.pose.bones
+    needed = set()
+    stack = list(bone_names)
+    while stack:
+        while stack:
+            bone_name = stack.pop()
+            if bone_name in needed or bone_name not in pose_bones:
+                continue
+            needed.add(bone_name)
+            pose_bone = pose_bones[bone_name]
+            if pose_bone.parent:
+                stack.append(pose_bone.parent.name)
+            for constraint in pose_bone.constraints:
+                stack += constraint_subtargets(armature, constraint)
+        # IK chains ending in an unrelated bone still move the bones of the chain
+        for pose_bone in pose_bones:
+            if pose_bone.name in needed:
+                continue
+            for constraint in pose_bone.constraints:
+                if constraint.type not in IK_CONSTRAINTS or constraint.mute:
+                    continue
+                chain = pose_bone.parent_recursive
+                if constraint.chain_count:
+                    chain = chain[:constraint.chain_count - 1]
+                if any(bone.name in needed for bone in chain):
+                    stack.append(pose_bone.name)
+                    break
+    return needed
+
+# Hide the objects and mute the bone constraints the baked bones don't depend on while sampling,
+# so each frame evaluates only their dependency chain. Everything is restored on exit, even on error.
+@contextmanager
+def isolate_bake(context, armature, bone_names):
+    if not context.scene.loca.isolate_bake:
+        yield
+        return
+    hidden_objects = []
+    muted_constraints = []
+    try:
+        needed_objects = object_dependencies(armature)
+        if needed_objects is not None:
+            for obj in context.view_layer.objects:
+                if obj.name_full not in needed_objects and not obj.hide_viewport and obj.library is None:
+                    # Hidden objects get deselected, their selection is restored with them
+                    hidden_objects.append((obj.name_full, obj.select_get()))
+                    obj.hide_viewport = True
+        needed_bones = bone_dependencies(armature, bone_names)
+        if needed_bones is not None:
+            for pose_bone in armature.pose.bones:
+                if pose_bone.name in needed_bones:
+                    continue
+                for constraint in pose_bone.constraints:
+                    if not constraint.mute:
+                        constraint.mute = True
+                        muted_constraints.append((pose_bone.name, constraint.name))
+        profile_count('isolated_objects', len(hidden_objects))
+        profile_count('isolated_constraints', len(muted_constraints))
+        yield
+    finally:
+        for bone_name, constraint_name in muted_constraints:
+            pose_bone = armature.pose.bones.get(bone_name)
+            if pose_bone and constraint_name in pose_bone.constraints:
+                pose_bone.constraints[constraint_name].mute = False
+        view_layer = context.view_layer
+        for object_name, selected in hidden_objects:
+            obj = bpy.data.objects.get(object_name)
+            if obj is not None:
+                obj.hide_viewport = False
+                if selected and obj.name in view_layer.objects:
+                    obj.select_set(True, view_layer=view_layer)
+
+
+# Run the steps of a bake generator to the end, return its result
+def run_steps(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+# Bake visual transforms of pose bones into the current action with the selected bake engine, yielding
+# the sampled fraction of the frame range after each chunk of frames. Returns the number of keys removed
+# by the optional key reduction pass; run it at once with run_steps. Nothing is written before sampling
+# is done, so closing it early leaves the action untouched.
+def bake_bones_steps(context, bone_names, st_frame, end_frame, clear_constraints=False):
+    armature = context.active_object
+    props = context.scene.loca
+    # Frames stepped here are cached by the sampler, with the state of the armature before baking
+    with profile_stage('bake_bones'), isolate_bake(context, armature, bone_names), PoseCache.suspend():
+        bones_dirty_frames = {}
+        if props.incremental_bake and not clear_constraints:
+            fcurve_index = FCurveIndex.from_object(armature)
+            for bone_name in bone_names:
+                dirty_frames = incremental_bake_frames(armature, bone_name, st_frame, end_frame, fcurve_index)
+                if dirty_frames is not None:
+                    bones_dirty_frames[bone_name] = dirty_frames
+        full_bake_names = [bone_name for bone_name in bone_names if bone_name not in bones_dirty_frames]
+
+        if full_bake_names and props.bake_engine in {'DIRECT', 'PARALLEL'}:
+            frames = range(st_frame, end_frame + 1)
+            matrices = None
+            if props.bake_engine == 'PARALLEL':
+                matrices = sample_poses_parallel(context, armature, full_bake_names, frames, props.parallel_workers)
+            if matrices is None:
+                sampler = PoseSampler(context, armature, full_bake_names, frames)
+                try:
+                    while not sampler.step(props.bake_chunk_frames):
+                        yield sampler.index / len(frames)
+                finally:
+                    matrices = sampler.finish()
+
+        if bones_dirty_frames:
+            bake_bones_incremental(context, armature, bones_dirty_frames, st_frame, end_frame)
+
+        if full_bake_names and props.bake_engine == 'ADAPTIVE':
+            frames, matrices, frames_sampled, max_errors = sample_poses_adaptive(
+                context, armature, full_bake_names, st_frame, end_frame, BAKE_CHANNELS, props)
+            if clear_constraints:
+                for bone_name in full_bake_names:
+                    armature.pose.bones[bone_name].constraints.clear()
+            write_baked_matrices(armature, full_bake_names, frames, matrices,
+                                 interpolation='LINEAR', replace_range=(st_frame, end_frame))
+            AdaptiveBakeStats.add(frames_sampled, end_frame - st_frame + 1, max_errors)
+        elif full_bake_names and props.bake_engine in {'DIRECT', 'PARALLEL'}:
+            if clear_constraints:
+                for bone_name in full_bake_names:
+                    armature.pose.bones[bone_name].constraints.clear()
+            write_baked_matrices(armature, full_bake_names, frames, matrices)
+        elif full_bake_names:
+            select_bones(context, full_bake_names)
+            profiling = LocaProfiler.current is not None
+            keys_before = action_key_count(ensure_action(armature)) if profiling else 0
+            with profile_stage('nla.bake'):
+                bpy.ops.nla.bake(frame_start=st_frame, frame_end=end_frame, only_selected=True, visual_keying=True,
+                                 clear_constraints=clear_constraints, use_current_action=True, bake_types={'POSE'})
+            if profiling:
+                profile_count('frames_evaluated', end_frame - st_frame + 1)
+                profile_count('keys_written', max(0, action_key_count(ensure_action(armature)) - keys_before))
+            remove_fcurves_by_data_path(context, 'active_selection_set')
+
+        if props.reduce_keys:
+            return reduce_baked_fcurves(armature, bone_names, st_frame, end_frame, props)
+    return 0
+
+
+WIDGET_PREFIX = "wgt_loca_shape_"
 
 class WidgetCache:
     cache = None
+    arrays = {}
 
     @classmethod
     def load_widgets(cls):
@@ -131,66 +1562,133 @@ class WidgetCache:
             cls.cache = {}
         return cls.cache
 
-# Function to reate widget for bone
+    # Flat vertex, edge and face arrays of a widget, ready for foreach_set
+    @classmethod
+    def load_widget_arrays(cls, widget_name):
+        if widget_name not in cls.arrays:
+            widget_data = cls.load_widgets()[widget_name]
+            faces = widget_data['faces']
+            cls.arrays[widget_name] = (
+                np.array(widget_data['vertices'], dtype=np.float32).ravel(),
+                np.array(widget_data['edges'], dtype=np.int32).ravel(),
+                np.array([index for face in faces for index in face], dtype=np.int32),
+                np.array([len(face) for face in faces], dtype=np.int32),
+            )
+        return cls.arrays[widget_name]
+
+    # Build the mesh of a widget from its flat arrays
+    @classmethod
+    def build_widget_mesh(cls, mesh_name, widget_name):
+        vertices, edges, face_loops, face_sizes = cls.load_widget_arrays(widget_name)
+        widget_mesh = bpy.data.meshes.new(mesh_name)
+        widget_mesh.vertices.add(len(vertices) // 3)
+        widget_mesh.vertices.foreach_set('co', vertices)
+        widget_mesh.edges.add(len(edges) // 2)
+        widget_mesh.edges.foreach_set('vertices', edges)
+        if len(face_sizes):
+            widget_mesh.loops.add(len(face_loops))
+            widget_mesh.loops.foreach_set('vertex_index', face_loops)
+            widget_mesh.polygons.add(len(face_sizes))
+            widget_mesh.polygons.foreach_set('loop_start', (np.cumsum(face_sizes) - face_sizes).astype(np.int32))
+        widget_mesh.update(calc_edges=True)
+        return widget_mesh
+
+    # Shared widget object, created once and reused by every locator showing this widget
+    @classmethod
+    def get_widget_object(cls, widget_name):
+        name = WIDGET_PREFIX + widget_name
+        widget_object = bpy.data.objects.get(name)
+        if widget_object is None or widget_object.library or widget_object.type != 'MESH':
+            widget_mesh = bpy.data.meshes.get(name)
+            if widget_mesh is None or widget_mesh.library:
+                widget_mesh = cls.build_widget_mesh(name, widget_name)
+            widget_object = bpy.data.objects.new(name, widget_mesh)
+        return widget_object
+
+# Approximate memory used by a widget mesh, in bytes
+def widget_mesh_size(widget_mesh):
+    return (len(widget_mesh.vertices) * 12 + len(widget_mesh.edges) * 8
+            + len(widget_mesh.loops) * 8 + len(widget_mesh.polygons) * 4)
+
+# Remove a Loca widget object once no bone uses it, with its mesh; return freed memory in bytes
+def free_widget(widget_name):
+    widget_object = bpy.data.objects.get(widget_name)
+    if (widget_object is None or widget_object.users or widget_object.library
+            or not widget_name.startswith("wgt_loca_")):
+        return 0
+    widget_mesh = widget_object.data
+    bpy.data.objects.remove(widget_object)
+    if widget_mesh is None or widget_mesh.users:
+        return 0
+    freed = widget_mesh_size(widget_mesh)
+    bpy.data.meshes.remove(widget_mesh)
+    return freed
+
+# Function to assign widget to bone
+@profiled
 def create_widget(bone, widget_name, widget_scale=[1, 1, 1], relative_size=True):
-    context = bpy.context
-    data = bpy.data
     widgets = WidgetCache.load_widgets()    
     if widget_name not in widgets:
         show_message_box(f"Widget '{widget_name}' not found in widgets.json.", "Error", 'ERROR')
         return
-    widget_data = widgets[widget_name]
-    matrixBone = bone
-
-    # Create a new mesh for the widget
-    widget_mesh = data.meshes.new("wgt_loca_" + bone.name)
-
-    # Preliminary calculation of bone length
-    bone_length = 1 if relative_size else (1 / bone.bone.length)
-
-    # Preliminary calculation of scaling
-    scale_factors = [widget_scale[0] * bone_length, widget_scale[2] * bone_length, widget_scale[1] * bone_length]
-    widget_vertices = [
-        (v[0] * scale_factors[0], v[1] * scale_factors[1], v[2] * scale_factors[2])
-        for v in widget_data['vertices']
-    ]
-
-    # Create and apply transformation matrix
-    widget_transform_matrix = Matrix.Diagonal([bone_length, bone_length, bone_length, 1.0])
-
-    # Apply matrix to mesh data
-    widget_mesh.from_pydata(widget_vertices, widget_data['edges'], widget_data['faces'])
-    widget_mesh.transform(widget_transform_matrix)
-    widget_mesh.update(calc_edges=True)
-
-    # Create a new widget object
-    widget_object = data.objects.new("wgt_loca_" + bone.name, widget_mesh)
-    widget_object.data = widget_mesh
-    widget_object.name = "wgt_loca_" + bone.name
-
-    # Apply world matrix and scale
-    widget_object.matrix_world = context.active_object.matrix_world @ matrixBone.bone.matrix_local
-    widget_object.scale = [matrixBone.bone.length] * 3
-    context.view_layer.update()
 
-    # Assign widget to bone
+    # Widgets are shared between locators, so the size is set per bone
+    if list(widget_scale) != [1, 1, 1] or not relative_size:
+        bone_length = 1 if relative_size else (1 / bone.bone.length)
+        bone.custom_shape_scale_xyz = (
+            widget_scale[0] * bone_length, widget_scale[2] * bone_length, widget_scale[1] * bone_length)
+
+    # Assign widget to bone and free the previous one if it is not used anymore
+    previous_widget = bone.custom_shape
+    widget_object = WidgetCache.get_widget_object(widget_name)
     bone.custom_shape = widget_object
     bone.bone.show_wire = True
+    if previous_widget and previous_widget != widget_object:
+        free_widget(previous_widget.name)
 
-def get_final_frame_from_locator(context, loc_name):
+def get_final_frame_from_locator(context, loc_name, fcurve_index=None):
     armature = context.active_object
     end_frame = context.scene.frame_end
-    if armature.animation_data and armature.animation_data.action:
-        for fcurve in armature.animation_data.action.fcurves:
-            if f'{loc_name}_LOCA' in fcurve.data_path.split('"')[1]:
+    if fcurve_index is None:
+        fcurve_index = FCurveIndex.from_object(armature)
+    for bone_name in fcurve_index.bone_names(lambda name: f'{loc_name}_LOCA' in name):
+        for fcurve in fcurve_index.fcurves(bone_name):
+            if fcurve.keyframe_points:
                 end_frame = int(fcurve.keyframe_points[-1].co[0])
     return end_frame
 
+# Apply the visual transform of pose bones to their local transform, like pose.visual_transform_apply
+@profiled
+def apply_visual_transforms(context, armature, bone_names):
+    if not bone_names:
+        return
+    context.view_layer.update()
+    pose_bones = armature.pose.bones
+    local_space = transforms.LocalSpace(armature, bone_names)
+    if not local_space.supported:
+        for bone_name in bone_names:
+            pose_bone = pose_bones[bone_name]
+            pose_bone.matrix_basis = armature.convert_space(
+                pose_bone=pose_bone, matrix=pose_bone.matrix, from_space='POSE', to_space='LOCAL')
+        return
+    local = local_space.to_local(transforms.read_matrices(pose_bones)[local_space.indices])
+    for bone_name, matrix in zip(bone_names, local):
+        pose_bones[bone_name].matrix_basis = Matrix(matrix.tolist())
+
+# Delete locator bones in a single edit mode session and free widgets no other locator shows
+@profiled
 def delete_locators(context, locators):
     armature = context.active_object
+    widget_names = {armature.pose.bones[loc_name].custom_shape.name for loc_name in locators
+                    if loc_name in armature.pose.bones and armature.pose.bones[loc_name].custom_shape}
+    set_armature_mode(context, "EDIT")
     for loc_name in locators:
         if loc_name in armature.data.edit_bones:
             armature.data.edit_bones.remove(armature.data.edit_bones[loc_name])
+    # Pose bones of deleted locators release their widgets when the pose is rebuilt
+    set_armature_mode(context, "POSE")
+    LocatorRegistry.invalidate(armature)
+    return sum(free_widget(widget_name) for widget_name in widget_names)
 
 def get_preview_range(context):
     scene = context.scene
@@ -234,6 +1732,122 @@ class locaProps(PropertyGroup):
         default=False,
     )
 
+    bake_engine: EnumProperty(
+        items=[
+            ('NLA', 'NLA Bake', 'Bake with the built-in NLA bake operator'),
+            ('DIRECT', 'Direct', 'Sample bone matrices directly and write keyframes in bulk'),
+            ('PARALLEL', 'Parallel', 'Sample frame chunks in background Blender processes and write keyframes in bulk'),
+            ('ADAPTIVE', 'Adaptive', 'Sample only the frames needed to keep the baked motion within the reduction '
+                                     'tolerances, with linear keys'),
+        ],
+        description="Engine used to bake locators and relevant bones",
+        default='DIRECT',
+    )
+
+    parallel_workers: IntProperty(
+        description="Number of background Blender processes sampling frame chunks",
+        default=max(2, min(8, os.cpu_count() or 2)),
+        min=2,
+        max=64,
+    )
+
+    pose_cache: BoolProperty(
+        description="Reuse poses sampled by earlier bakes and while scrubbing, as long as the armature is unchanged",
+        default=True,
+    )
+
+    pose_cache_limit: IntProperty(
+        description="Memory used to cache sampled poses, in MB",
+        default=256,
+        min=0,
+    )
+
+    disk_cache: BoolProperty(
+        description="Also save sampled poses to disk, so bakes of unchanged armatures are reused in later sessions",
+        default=False,
+    )
+
+    disk_cache_dir: StringProperty(
+        description="Directory of the disk pose cache, relative paths start at the .blend file",
+        default="//loca_cache",
+        subtype='DIR_PATH',
+    )
+
+    disk_cache_limit: IntProperty(
+        description="Disk space used by the disk pose cache, in MB",
+        default=2048,
+        min=0,
+    )
+
+    isolate_bake: BoolProperty(
+        description="While baking, hide objects and mute bone constraints the baked bones don't depend on",
+        default=False,
+    )
+
+    modal_bake: BoolProperty(
+        description="Bake from the panel in chunks of frames, showing progress and cancelling with Esc",
+        default=True,
+    )
+
+    bake_chunk_frames: IntProperty(
+        description="Frames sampled per step of a modal bake",
+        default=50,
+        min=1,
+    )
+
+    incremental_bake: BoolProperty(
+        description="Resample only the frames changed since the locators were baked",
+        default=True,
+    )
+
+    reduce_keys: BoolProperty(
+        description="Remove static channels and redundant keys after baking",
+        default=False,
+    )
+
+    reduce_tolerance_location: bpy.props.FloatProperty(
+        description="Maximum location error allowed when removing keys",
+        default=0.001,
+        min=0.0,
+        precision=4,
+    )
+
+    reduce_tolerance_rotation: bpy.props.FloatProperty(
+        description="Maximum rotation error allowed when removing keys",
+        default=0.001,
+        min=0.0,
+        precision=4,
+    )
+
+    reduce_tolerance_scale: bpy.props.FloatProperty(
+        description="Maximum scale error allowed when removing keys",
+        default=0.001,
+        min=0.0,
+        precision=4,
+    )
+
+    profile_operators: BoolProperty(
+        description="Record stage timings and counters of Loca operators",
+        default=False,
+    )
+
+    profile_log_path: StringProperty(
+        description="JSONL file each profile report is appended to, leave empty to keep reports in the panel only",
+        default="",
+        subtype='FILE_PATH',
+    )
+
+    profile_frames: IntProperty(
+        description="Frames stepped from the current frame for each constraint profiling pass",
+        default=24,
+        min=1,
+    )
+
+    show_profile_report: BoolProperty(
+        description="Show the profile report of the last Loca operator",
+        default=False,
+    )
+
     bake_start_fr: IntProperty(
         description="Select start frame for baking",
         default = 1,
@@ -259,8 +1873,95 @@ class locaProps(PropertyGroup):
     )
 
 
+class LocaModalBake:
+    """Operator mixin running the `run` generator of a bake operator from a window manager timer, so
+    the UI stays responsive, progress is shown and Esc cancels. execute runs all steps at once."""
+    # Label, sampled fraction and ETA in seconds of the running modal bake, None when idle
+    progress = None
+    # Events still handled by the viewport while baking
+    PASS_THROUGH_EVENTS = {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'MOUSEMOVE', 'TRACKPADPAN', 'TRACKPADZOOM'}
+
+    @profiled_operator
+    def execute(self, context):
+        return run_steps(self.run(context))
+
+    def invoke(self, context, event):
+        if LocaModalBake.progress is not None:
+            self.report({'WARNING'}, f"Wait for {LocaModalBake.progress[0]} to finish")
+            return {'CANCELLED'}
+        props = context.scene.loca
+        if not props.modal_bake:
+            return self.execute(context)
+        # The report is current only while a step runs, other operators may run between timer events
+        self.profile_report = begin_operator_profile(self) if props.profile_operators else None
+        self.steps = self.run(context)
+        self.start = time.perf_counter()
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(0.01, window=context.window)
+        window_manager.modal_handler_add(self)
+        window_manager.progress_begin(0, 100)
+        LocaModalBake.progress = (self.bl_label, 0.0, None)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.cancel(context)
+            self.report({'WARNING'}, f"{self.bl_label}: cancelled")
+            return {'CANCELLED'}
+        if event.type in self.PASS_THROUGH_EVENTS:
+            return {'PASS_THROUGH'}
+        if event.type != 'TIMER':
+            return {'RUNNING_MODAL'}
+
+        LocaProfiler.current = self.profile_report
+        try:
+            factor = next(self.steps)
+        except StopIteration as stop:
+            self.end(context)
+            return stop.value
+        except Exception:
+            self.end(context)
+            raise
+        finally:
+            LocaProfiler.current = None
+        elapsed = time.perf_counter() - self.start
+        eta = elapsed * (1 - factor) / factor if factor else None
+        LocaModalBake.progress = (self.bl_label, factor, eta)
+        context.window_manager.progress_update(int(factor * 100))
+        context.workspace.status_text_set(
+            f"{self.bl_label}: {factor * 100:.0f}%" + (f", {eta:.0f} s left" if eta is not None else "")
+            + " (Esc to cancel)")
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+        return {'RUNNING_MODAL'}
+
+    # Closing the steps rolls back what they created so far
+    def cancel(self, context):
+        LocaProfiler.current = self.profile_report
+        try:
+            self.steps.close()
+        finally:
+            LocaProfiler.current = None
+        if self.profile_report is not None:
+            self.profile_report['cancelled'] = True
+        self.end(context)
+
+    def end(self, context):
+        if self.profile_report is not None:
+            end_operator_profile(self, self.profile_report, context.scene.loca)
+            self.profile_report = None
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        LocaModalBake.progress = None
+        for area in context.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
 # Operator to create locators
-class ARMATURE_OT_loca_create_locator(Operator):
+class ARMATURE_OT_loca_create_locator(LocaModalBake, Operator):
     """Create Locator"""
 
     bl_label = 'Create Locator'
@@ -276,73 +1977,109 @@ class ARMATURE_OT_loca_create_locator(Operator):
         suffix = 'AL' if props.add_attached_locator else 'RL' if self.add_rl_or_al else 'TL'
         return f'{bone_P.name}_LOCA_{suffix}'
 
-    def get_unique_locator_name(self, armature, base_name):
+    def get_unique_locator_name(self, armature, base_name, reserved_names=()):
         locator_name = base_name
         count = 1
-        while locator_name in armature.pose.bones:
+        while locator_name in armature.pose.bones or locator_name in reserved_names:
             locator_name = f"{base_name}.{count:03d}"
             count += 1
         return locator_name    
 
-    def create_bone_locator(self, context, armature, bone_P, locator_name):
-        context.object.data.bones.active = context.object.data.bones.get(bone_P.name)
-        saved_bone_source_matrix = armature.matrix_world @ context.active_pose_bone.matrix
-        # create new bone for locator at the place of selected bone
+    # Create all locators with one edit mode session and one pose mode pass
+    def create_bone_locators(self, context, armature, locators):
+        # Cache rest and pose data of the source bones before leaving pose mode
+        sources = {}
+        for bone_name, locator_name in locators:
+            bone = armature.data.bones[bone_name]
+            sources[locator_name] = (bone.head_local.copy(), bone.tail_local.copy(), bone.matrix_local.copy(),
+                                     armature.pose.bones[bone_name].matrix.copy())
+
+        # create new bones for locators at the place of selected bones
         set_armature_mode(context, "EDIT")
-        source_E = armature.data.edit_bones[bone_P.name]
-        locator_E = armature.data.edit_bones.new(locator_name)
-        locator_E.head = source_E.head
-        locator_E.tail = source_E.tail
-        locator_E.matrix = source_E.matrix
+        edit_bones = armature.data.edit_bones
+        for bone_name, locator_name in locators:
+            head, tail, matrix_local, pose_matrix = sources[locator_name]
+            locator_E = edit_bones.new(locator_name)
+            locator_E.head = head
+            locator_E.tail = tail
+            locator_E.matrix = matrix_local
 
         set_armature_mode(context, "POSE")
-        locator_P = context.object.pose.bones[locator_name]
-        locator_P.matrix = armature.matrix_world.inverted() @ saved_bone_source_matrix
-        # set widget for locator
-        create_widget(locator_P, "locator")
-        locator_P.color.palette = 'THEME13'
-
-    def setup_rotation_attached_locator(self, context, locator_P, has_armature_constraint):
-        locators_RT_name_list.append(locator_P.name)
-        if not has_armature_constraint:
-            bpy.ops.pose.visual_transform_apply()
-            constraint = locator_P.constraints[0]
-            locator_P.constraints.remove(constraint)
+        created_locators = []
+        armature_constraint_bones = []
+        for bone_name, locator_name in locators:
+            bone_P = armature.pose.bones[bone_name]
+            locator_P = armature.pose.bones[locator_name]
+            locator_P.matrix = sources[locator_name][3]
+            # set widget for locator
+            create_widget(locator_P, "locator" if self.add_rl_or_al else "locator_tl")
+            locator_P.color.palette = 'THEME13'
+
+            # Check if there's an 'Armature' constraint on the original bone
+            has_armature_constraint = any(
+                constraint.type == 'ARMATURE'
+                for constraint in bone_P.constraints)
+            if has_armature_constraint:
+                armature_constraint_bones.append(bone_name)
+            else:
+                apply_constraint(locator_P, 'COPY_TRANSFORMS', armature, bone_name)
+            created_locators.append((locator_P, bone_P, has_armature_constraint))
+
+        if armature_constraint_bones:
+            show_message_box(
+                f"Selected bone {', '.join(armature_constraint_bones)} has an ARMATURE constraint. You will not be able to bake animation on it further" , 'THE BONE HAS AN ARMATURE CONSTRAINT')
+        return created_locators
+
+    def setup_rotation_attached_locators(self, context, locators):
+        armature = context.active_object
+        apply_visual_transforms(context, armature, [locator_P.name for locator_P, bone_P, has_armature_constraint
+                                                    in locators if not has_armature_constraint])
+        for locator_P, bone_P, has_armature_constraint in locators:
+            locators_RT_name_list.append(locator_P.name)
+            if not has_armature_constraint:
+                constraint = locator_P.constraints[0]
+                locator_P.constraints.remove(constraint)
         context.scene.loca.locator_positioning_active = True
-        select_bones(context, locator_P.name)
+        armature.data.bones.active = locators[-1][0].bone
+        select_bones(context, [locator_P.name for locator_P, bone_P, has_armature_constraint in locators])
 
         # Set transform orientation to LOCAL
-        bpy.context.scene.transform_orientation_slots[1].type = 'LOCAL'
+        context.scene.transform_orientation_slots[1].type = 'LOCAL'
 
         show_message_box('Choose position for locator and press button "Confirm Locator Position"', 'LOCATOR POSITIONING')
-        
-    def setup_transform_locator(self, context, locator_P, bone_P, st_frame, end_frame, has_armature_constraint):
+
+    # Bake all transform locators in a single frame sweep, yielding the bake progress
+    def setup_transform_locators(self, context, locators, st_frame, end_frame):
         armature = context.active_object
         scene = context.scene
         props = scene.loca
+        locators_to_bake = [locator_P.name for locator_P, bone_P, has_armature_constraint in locators
+                            if not has_armature_constraint]
 
         if props.without_baking:
-                bpy.ops.pose.visual_transform_apply()
+            select_bones(context, locators_to_bake)
+            apply_visual_transforms(context, armature, locators_to_bake)
+            for locator_P, bone_P, has_armature_constraint in locators:
                 if locator_P.constraints:
                     locator_P.constraints.remove(locator_P.constraints[0])
                 apply_constraint(bone_P, 'COPY_TRANSFORMS', armature, locator_P.name)
         else:
-            select_bones(context, locator_P.name)
-            if not has_armature_constraint:
-                bpy.ops.nla.bake(frame_start=st_frame, frame_end=end_frame, only_selected=True,
-                                visual_keying=True, clear_constraints=True, use_current_action=True, bake_types={'POSE'})
-                remove_fcurves_by_data_path(context, 'active_selection_set')
+            if locators_to_bake:
+                self.keys_removed += yield from bake_bones_steps(context, locators_to_bake, st_frame, end_frame,
+                                                                 clear_constraints=True)
 
                 hide_scale_fcurves(armature.name)
-            copy_transforms = apply_constraint(bone_P, 'COPY_TRANSFORMS', armature, locator_P.name)
-            set_keys_on_constraint_influence(copy_transforms, st_frame, end_frame)
-
-        set_armature_mode(context, "POSE")
-        select_bones(context, locator_P.name)
-        create_widget(locator_P, "locator_tl")
-
-    # Function to create a locator bone
-    def create_locator(self, context, bone_P, props):
+            for locator_P, bone_P, has_armature_constraint in locators:
+                copy_transforms = apply_constraint(bone_P, 'COPY_TRANSFORMS', armature, locator_P.name)
+                set_keys_on_constraint_influence(copy_transforms, st_frame, end_frame)
+            # One index of the action with all influence keys in place serves every snapshot
+            fcurve_index = FCurveIndex.from_object(armature)
+            for locator_P, bone_P, has_armature_constraint in locators:
+                if not has_armature_constraint:
+                    store_bake_snapshot(armature, locator_P.name, bone_P.name, st_frame, end_frame, fcurve_index)
+
+    # Function to create locator bones for all selected bones, yielding the bake progress
+    def create_locators(self, context, bones_P, props):
         armature = context.active_object
         scene = context.scene
 
@@ -352,52 +2089,49 @@ class ARMATURE_OT_loca_create_locator(Operator):
         st_frame = props.bake_start_fr
         end_frame = props.bake_end_fr
 
-        # Generate unique locator name
-        locator_base_name = self.create_locator_name(props, bone_P)
-        locator_name = self.get_unique_locator_name(armature, locator_base_name)
+        # Generate unique locator names
+        locator_names = []
+        for bone_P in bones_P:
+            locator_base_name = self.create_locator_name(props, bone_P)
+            locator_names.append(self.get_unique_locator_name(armature, locator_base_name, locator_names))
 
-        self.create_bone_locator(context, armature, bone_P, locator_name)
-
-        # Check if there's an 'Armature' constraint on the original bone
-        has_armature_constraint = any(
-            constraint.type == 'ARMATURE'
-            for constraint in bone_P.constraints)
-        
-        locator_P = context.object.pose.bones[locator_name]
-        if has_armature_constraint:
-            show_message_box(
-                f"Selected bone {bone_P.name} has an ARMATURE constraint. You will not be able to bake animation on it further" , 'THE BONE HAS AN ARMATURE CONSTRAINT')
-        else:
-            apply_constraint(locator_P, 'COPY_TRANSFORMS', armature, bone_P.name)
+        locators = self.create_bone_locators(context, armature, [
+            (bone_P.name, locator_name) for bone_P, locator_name in zip(bones_P, locator_names)])
 
         # make locator active in POSEMODE
-        context.object.data.bones.active = locator_P.bone
+        armature.data.bones.active = locators[-1][0].bone
 
         if self.add_rl_or_al:
-            self.setup_rotation_attached_locator(context, locator_P, has_armature_constraint)
+            self.setup_rotation_attached_locators(context, locators)
         else:
-            self.setup_transform_locator(context, locator_P, bone_P, st_frame, end_frame, has_armature_constraint)
+            try:
+                yield from self.setup_transform_locators(context, locators, st_frame, end_frame)
+            except GeneratorExit:
+                # Bake cancelled, remove the locators created for it
+                delete_locators(context, locator_names)
+                raise
+        LocatorRegistry.invalidate(armature)
 
-        return locator_name
+        return locator_names
 
     @classmethod
     def poll(cls, context):
         return context.selected_pose_bones is not None
 
-    def execute(self, context):
+    def run(self, context):
         props = context.scene.loca
         props.locator_positioning_active = False
+        self.keys_removed = 0
         sel_bones = context.selected_pose_bones
         created_locators = []
 
-        for bone in sel_bones:
-            locator_name = self.create_locator(context, bone, props)
-            created_locators.append(locator_name)
+        if sel_bones:
+            created_locators = yield from self.create_locators(context, sel_bones, props)
         if created_locators:
             select_bones(context, created_locators)
 
         if not self.add_rl_or_al:
-            self.report({'INFO'}, 'Transform Locator Created')
+            self.report({'INFO'}, 'Transform Locator Created' + keys_removed_message(props, self.keys_removed))
         self.add_rot_locator = False
         return {'FINISHED'}
     
@@ -424,17 +2158,14 @@ class ARMATURE_OT_loca_create_locator_RL_AL(Operator):
 
         set_armature_mode(context, "POSE")
         bone_name = loc_name.rsplit('_LOCA', 1)[0]
-        print('loc_name', loc_name)
-        print('bone_name', bone_name)
         locator = context.object.data.bones[loc_name]
         locator_P = context.object.pose.bones[loc_name]
         context.object.data.bones.active = locator
         pose_bone = context.object.pose.bones[bone_name]
 
-        apply_constraint(locator_P, 'CHILD_OF', armature, bone_name)
-
         if props.without_baking:
-            bpy.ops.pose.visual_transform_apply()
+            apply_constraint(locator_P, 'CHILD_OF', armature, bone_name)
+            apply_visual_transforms(context, armature, [loc_name])
             if locator_P.constraints:
                     locator_P.constraints.remove(locator_P.constraints[0])
 
@@ -452,21 +2183,11 @@ class ARMATURE_OT_loca_create_locator_RL_AL(Operator):
                         armature.animation_data_clear()
         else:
             if props.add_attached_locator:
+                apply_constraint(locator_P, 'CHILD_OF', armature, bone_name)
                 create_widget(locator_P, "locator_al")
-                if armature.animation_data and armature.animation_data.action:
-                    action = armature.animation_data.action
-                    curves_to_remove = [fcurve for fcurve in action.fcurves if loc_name in fcurve.data_path]                    
-                    for fcurve in curves_to_remove:
-                        action.fcurves.remove(fcurve)                
+                remove_fcurves_by_data_path(context, loc_name)
             else:
-                select_bones(context, loc_name)
-                bpy.ops.anim.keyframe_insert_menu(type='Location')
-                bpy.ops.nla.bake(frame_start=st_frame, frame_end=end_frame, only_selected=True,
-                                visual_keying=True, clear_constraints=True, use_current_action=True, bake_types={'POSE'}, channel_types={'LOCATION'})
-                remove_fcurves_by_data_path(context, 'active_selection_set')
-                locator_P = context.object.pose.bones[locator.name]
-                if locator_P.constraints:
-                    locator_P.constraints.remove(locator_P.constraints[0])
+                self.keys_removed += bake_offset_locator(context, armature, loc_name, bone_name, st_frame, end_frame)
                 hide_scale_fcurves(armature.name)
                 damped_track = apply_constraint(pose_bone, 'DAMPED_TRACK', armature, loc_name, props.axis)
                 set_keys_on_constraint_influence(damped_track, st_frame, end_frame)
@@ -478,20 +2199,23 @@ class ARMATURE_OT_loca_create_locator_RL_AL(Operator):
     def poll(cls, context):
         return context.selected_pose_bones is not None
 
+    @profiled_operator
     def execute(self, context):
         props = context.scene.loca
         props.locator_positioning_active = False
+        self.keys_removed = 0
 
         for locator in locators_RT_name_list:
             self.bake_locator(context, locator)
+        LocatorRegistry.invalidate(context.active_object)
         select_bones(context, locators_RT_name_list)
         locators_RT_name_list.clear()
 
 
         if props.add_attached_locator:
-            self.report({'INFO'}, 'Attached Locator Created')
+            self.report({'INFO'}, 'Attached Locator Created' + keys_removed_message(props, self.keys_removed))
         else:
-            self.report({'INFO'}, 'Rotation Locator Created')
+            self.report({'INFO'}, 'Rotation Locator Created' + keys_removed_message(props, self.keys_removed))
         props.add_attached_locator = False
 
         return {'FINISHED'}
@@ -504,6 +2228,7 @@ class ARMATURE_OT_loca_create_locator_AL(Operator):
     bl_idname = 'loca.create_locator_al'
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiled_operator
     def execute(self, context):
         props = context.scene.loca
         props.add_attached_locator = True
@@ -513,7 +2238,7 @@ class ARMATURE_OT_loca_create_locator_AL(Operator):
         return {'FINISHED'}
 
 
-class ARMATURE_OT_loca_bake_and_delete(Operator):
+class ARMATURE_OT_loca_bake_and_delete(LocaModalBake, Operator):
     """Bake relevant bones & delele all locators"""
 
     bl_label = 'Bake relevant bones & delele all locators'
@@ -525,129 +2250,128 @@ class ARMATURE_OT_loca_bake_and_delete(Operator):
         default=True,
     )
 
-    def bake(self, context, bone_name):
+    # Bake all relevant bones in a single frame sweep yielding its progress, return the names of the existing bones
+    def bake(self, context, bone_names):
         armature = context.active_object
         scene = context.scene
         props = scene.loca
-        bone_P = context.object.pose.bones[bone_name]
-        if bone_name not in armature.pose.bones:
-            self.report({'WARNING'}, f'Bone "{bone_name}" does not exist.')
-            return 
-        
-        select_bones(context, bone_name)
-        
+        existing_bones = []
+        for bone_name in bone_names:
+            if bone_name in armature.pose.bones:
+                existing_bones.append(bone_name)
+            else:
+                self.report({'WARNING'}, f'Bone "{bone_name}" does not exist.')
+        if not existing_bones:
+            return existing_bones
+
+        select_bones(context, existing_bones)
+
         if scene.use_preview_range:
             get_preview_range(context)
-        
+
         st_frame = props.bake_start_fr
         end_frame = props.bake_end_fr
 
         if self.bake_on_delete:
-            bpy.ops.nla.bake(
-                frame_start=st_frame, 
-                frame_end=end_frame, 
-                only_selected=True,
-                visual_keying=True, 
-                clear_constraints=False, 
-                use_current_action=True, 
-                bake_types={'POSE'}
-            )
-
-        remove_fcurves_by_data_path(context, 'active_selection_set')        
-        remove_constraints_by_name_part(bone_P, '_LOCA')
-        find_and_remove_broken_fcurves(context)      
-        hide_scale_fcurves(armature.name, bone_name)
+            self.keys_removed += yield from bake_bones_steps(context, existing_bones, st_frame, end_frame)
+        return existing_bones
 
-    def execute(self, context):
+    # Clean up constraints and F-curves of all baked bones from a single F-curve index
+    def cleanup(self, context, bone_names, fcurve_index):
         armature = context.active_object
+        fcurve_index.remove_other_fcurves(lambda data_path: 'active_selection_set' in data_path)
+        for bone_name in bone_names:
+            remove_constraints_by_name_part(armature.pose.bones[bone_name], '_LOCA')
+        self.fcurves_removed += find_and_remove_broken_fcurves(context, fcurve_index=fcurve_index)
+        hide_scale_fcurves(armature.name, bone_names, fcurve_index)
 
-        bones_name_list = {bone.name.split('_LOCA')[0] for bone in armature.pose.bones if '_LOCA' in bone.name}
+    def run(self, context):
+        armature = context.active_object
+        self.keys_removed = 0
+        self.fcurves_removed = 0
 
-        for bone in bones_name_list:
-            self.bake(context, bone)
+        locators = LocatorRegistry.get(armature)['locators']
+        bones_name_list = {locator['source'] for locator in locators.values()}
+        locators_to_remove = list(locators)
 
-        locators_to_remove  = [bone.name for bone in armature.pose.bones if '_LOCA' in bone.name]
+        baked_bones = yield from self.bake(context, sorted(bones_name_list))
 
-        set_armature_mode(context, "EDIT")
-        delete_locators(context, locators_to_remove )
-        set_armature_mode(context, "POSE")
-        remove_fcurves_by_data_path(context, '_LOCA')
+        fcurve_index = FCurveIndex.from_object(armature)
+        self.cleanup(context, baked_bones, fcurve_index)
+        delete_locators(context, locators_to_remove)
+        self.fcurves_removed += remove_fcurves_by_data_path(context, '_LOCA', fcurve_index)
 
         locators_RT_name_list.clear()
 
         if self.bake_on_delete:
-            self.report({'INFO'}, 'Relevant Bones Baked & Locators Removed')
+            self.report({'INFO'}, 'Relevant Bones Baked & Locators Removed'
+                        + keys_removed_message(context.scene.loca, self.keys_removed)
+                        + f', {self.fcurves_removed} F-curves cleaned up')
         else:
-            self.report({'INFO'}, 'Locators Removed')
+            self.report({'INFO'}, f'Locators Removed, {self.fcurves_removed} F-curves cleaned up')
 
         return {'FINISHED'}
     
 
-class ARMATURE_OT_loca_bake_and_delete_selected(Operator):
+class ARMATURE_OT_loca_bake_and_delete_selected(LocaModalBake, Operator):
     """Bake relevat bones & delete selected locators"""
 
     bl_label = 'Bake relevat bones & delete selected locators'
     bl_idname = 'loca.bake_and_del_selected'
     bl_options = {'REGISTER', 'UNDO'}
 
-    def bake(self, context, bone_name):
-        st_frame = context.scene.frame_start
-        end_frame = context.scene.frame_end
+    # Bake all bones in a single frame sweep, yielding its progress
+    def bake(self, context, bone_names):
         scene = context.scene
         props = scene.loca
-        bone_P = context.object.pose.bones[bone_name]
-
-        has_armature_constraint = any(
-            constraint.type == 'ARMATURE'
-            for constraint in bone_P.constraints)
-        if has_armature_constraint:
+        if not bone_names:
             return
 
-        select_bones(context, bone_name)
-        
+        select_bones(context, bone_names)
+
         if scene.use_preview_range:
             get_preview_range(context)
-        
+
         st_frame = props.bake_start_fr
         end_frame = props.bake_end_fr
 
-        bpy.ops.nla.bake(
-            frame_start=st_frame, 
-            frame_end=end_frame, 
-            only_selected=True,
-            visual_keying=True, 
-            clear_constraints=False, 
-            use_current_action=True, 
-            bake_types={'POSE'}
-        )
-        remove_fcurves_by_data_path(context, 'active_selection_set')
-        remove_constraints_by_name_part(bone_P, '_LOCA')
-        remove_fcurves_by_data_path(context, f'{bone_name}_LOCA')
-        find_and_remove_broken_fcurves(context)
+        self.keys_removed += yield from bake_bones_steps(context, bone_names, st_frame, end_frame)
 
-    def execute(self, context):
+    # Clean up constraints and F-curves of all baked bones from a single F-curve index
+    def cleanup(self, context, bone_names, fcurve_index):
         armature = context.active_object
-        selected_bones = [bone for bone in armature.pose.bones if bone.bone.select]
-        original_bone_list = set()
-        locators_to_remove  = set()
-
-        for bone in selected_bones:
-            if any("_LOCA_" in constraint.subtarget for constraint in bone.constraints):
-                    original_bone_list.add(bone)
-                    print(bone.name)
+        for bone_name in bone_names:
+            remove_constraints_by_name_part(armature.pose.bones[bone_name], '_LOCA')
+        locator_prefixes = {f'{bone_name}_LOCA' for bone_name in bone_names}
+        for bone_name in fcurve_index.bone_names(
+                lambda name: '_LOCA' in name and name[:name.index('_LOCA') + 5] in locator_prefixes):
+            self.fcurves_removed += fcurve_index.remove_bone_fcurves(bone_name)
+        self.fcurves_removed += find_and_remove_broken_fcurves(context, fcurve_index=fcurve_index)
+
+    def run(self, context):
+        armature = context.active_object
+        self.keys_removed = 0
+        self.fcurves_removed = 0
+        driven_bones = LocatorRegistry.get(armature)['driven_bones']
+        original_bone_list = {bone for bone in context.selected_pose_bones or [] if bone.name in driven_bones}
+        locators_to_remove = set()
 
+        baked_bones = []
         for bone in original_bone_list:
             if not any(constraint.type == 'ARMATURE' for constraint in bone.constraints):
-                locators_to_remove .update(constraint.subtarget for constraint in bone.constraints 
-                if '_LOCA' in constraint.name and constraint.target)
-                self.bake(context, bone.name)
-        print('locators_to_remove', locators_to_remove)
-
-        set_armature_mode(context, "EDIT")
-        # delete_locators(context, locators_to_remove )
-        set_armature_mode(context, "POSE")
-
-        self.report({'INFO'}, 'Relevant Bones Baked & Selected Locators Removed')
+                locators_to_remove.update(constraint.subtarget for constraint in bone.constraints
+                                          if '_LOCA' in constraint.name and constraint.target)
+                baked_bones.append(bone.name)
+        baked_bones.sort()
+        yield from self.bake(context, baked_bones)
+        self.cleanup(context, baked_bones, FCurveIndex.from_object(armature))
+
+        delete_locators(context, locators_to_remove)
+        locators_RT_name_list[:] = [name for name in locators_RT_name_list if name not in locators_to_remove]
+
+        self.report({'INFO'}, 'Relevant Bones Baked & Selected Locators Removed'
+                    + keys_removed_message(context.scene.loca, self.keys_removed)
+                    + f', {self.fcurves_removed} F-curves cleaned up')
         return {'FINISHED'}
     
 
@@ -659,22 +2383,22 @@ class ARMATURE_OT_loca_delete_selected_locators(Operator):
     bl_description = "Delete selected locators"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiled_operator
     def execute(self, context):
         selected_bones = context.selected_pose_bones
+        locators = LocatorRegistry.get(context.object)['locators']
         locators_to_delete = []
 
         for bone in selected_bones:
-            if '_LOCA' in bone.name:
-                base_bone_name = bone.name.rsplit('_LOCA_', 1)[0]
+            if bone.name in locators:
+                base_bone_name = locators[bone.name]['source']
                 # Bone associated with the locator
                 if base_bone_name in context.object.pose.bones:
                     base_bone_P = context.object.pose.bones[base_bone_name]
                     remove_constraints_by_name_part(base_bone_P, '_LOCA')
                 locators_to_delete.append(bone.name)
 
-        set_armature_mode(context, "EDIT")
         delete_locators(context, locators_to_delete)
-        set_armature_mode(context, "POSE")
 
         self.report({'INFO'}, 'Selected Locators Removed')
         return {'FINISHED'}
@@ -689,12 +2413,11 @@ class ARMATURE_OT_loca_select_all_locators(Operator):
     def poll(cls, context):
         return context.object and context.object.type == 'ARMATURE' and context.object.mode == 'POSE'
 
+    @profiled_operator
     def execute(self, context):
-        for bone in context.object.pose.bones:
-            if 'LOCA' in bone.name:
-                bone.bone.select = True
-            else:
-                bone.bone.select = False
+        locators = LocatorRegistry.get(context.object)['locators']
+        for bone in context.object.data.bones:
+            bone.select = bone.name in locators
 
         self.report({'INFO'}, 'All locators selected')
         return {'FINISHED'}
@@ -706,6 +2429,7 @@ class ARMATURE_OT_loca_cycle_widget(Operator):
     bl_idname = "loca.cycle_widget"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiled_operator
     def execute(self, context):
         widgets = WidgetCache.load_widgets()
         widget_names = list(widgets.keys())
@@ -736,6 +2460,7 @@ class ARMATURE_OT_loca_cycle_color(Operator):
     bl_idname = "loca.cycle_color"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiled_operator
     def execute(self, context):
         selected_bones = context.selected_pose_bones
 
@@ -754,6 +2479,121 @@ class ARMATURE_OT_loca_cycle_color(Operator):
     
     
 
+class ARMATURE_OT_loca_purge_widgets(Operator):
+    """Remove Loca widget objects and meshes no locator uses"""
+    bl_label = "Purge Loca Widgets"
+    bl_idname = "loca.purge_widgets"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @profiled_operator
+    def execute(self, context):
+        widget_names = [obj.name for obj in bpy.data.objects if obj.name.startswith("wgt_loca_")]
+        freed = 0
+        widgets_removed = 0
+        for widget_name in widget_names:
+            widget_freed = free_widget(widget_name)
+            if widget_name not in bpy.data.objects:
+                widgets_removed += 1
+                freed += widget_freed
+        for widget_mesh in [mesh for mesh in bpy.data.meshes
+                            if mesh.name.startswith("wgt_loca_") and not mesh.users and not mesh.library]:
+            freed += widget_mesh_size(widget_mesh)
+            bpy.data.meshes.remove(widget_mesh)
+            widgets_removed += 1
+
+        self.report({'INFO'}, f"Purged {widgets_removed} Loca widgets, freed {freed / 1024:.1f} KB")
+        return {'FINISHED'}
+
+
+# Scene evaluation time per frame over a frame window, best of several passes after a warm-up pass
+def time_frame_window(scene, frames, passes=3):
+    for frame in frames:
+        scene.frame_set(frame)
+    best = None
+    for _ in range(passes):
+        start = time.perf_counter()
+        for frame in frames:
+            scene.frame_set(frame)
+        seconds = (time.perf_counter() - start) / len(frames)
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+class ARMATURE_OT_loca_profile_constraints(Operator):
+    """Measure the playback cost of each live locator by stepping frames with its constraints muted"""
+    bl_label = "Profile Locator Constraints"
+    bl_idname = "loca.profile_constraints"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.type == 'ARMATURE' and context.object.mode == 'POSE'
+
+    @profiled_operator
+    def execute(self, context):
+        scene = context.scene
+        props = scene.loca
+        armature = context.object
+        pose_bones = armature.pose.bones
+        locator_constraints = {}
+        for locator_name, locator in LocatorRegistry.get(armature)['locators'].items():
+            constraints = [pose_bones[bone_name].constraints[constraint_name]
+                           for bone_name, constraint_name in locator['constraints']
+                           if bone_name in pose_bones and constraint_name in pose_bones[bone_name].constraints]
+            constraints = [constraint for constraint in constraints if not constraint.mute]
+            if constraints:
+                locator_constraints[locator_name] = constraints
+        if not locator_constraints:
+            self.report({'WARNING'}, "No locator with live constraints")
+            return {'CANCELLED'}
+
+        frames = range(scene.frame_current, scene.frame_current + props.profile_frames)
+        frame_current, frame_subframe = scene.frame_current, scene.frame_subframe
+        all_constraints = [constraint for constraints in locator_constraints.values() for constraint in constraints]
+        costs = []
+        # Poses of muted stacks must not reach the pose cache
+        with PoseCache.suspend():
+            try:
+                total = time_frame_window(scene, frames)
+                for locator_name, constraints in locator_constraints.items():
+                    for constraint in constraints:
+                        constraint.mute = True
+                    costs.append((locator_name, total - time_frame_window(scene, frames), len(constraints)))
+                    for constraint in constraints:
+                        constraint.mute = False
+                for constraint in all_constraints:
+                    constraint.mute = True
+                baseline = time_frame_window(scene, frames)
+            finally:
+                for constraint in all_constraints:
+                    constraint.mute = False
+                scene.frame_set(frame_current, subframe=frame_subframe)
+
+        costs.sort(key=lambda cost: -cost[1])
+        report = {
+            'operator': self.bl_idname,
+            'blend_file': bpy.data.filepath,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'armature': armature.name,
+            'frames': [frames.start, frames.stop - 1],
+            'ms_per_frame': total * 1000,
+            'ms_per_frame_without_locators': baseline * 1000,
+            'locators': [{'name': name, 'constraints': n_constraints, 'ms_per_frame': max(0.0, cost) * 1000,
+                          'share': max(0.0, cost) / total if total else 0.0}
+                         for name, cost, n_constraints in costs],
+        }
+        LocaProfiler.constraint_report = report
+        error = LocaProfiler.log(report, props)
+        if error:
+            self.report({'WARNING'}, error)
+        for entry in report['locators']:
+            print(f"{entry['name']}: {entry['ms_per_frame']:.2f} ms/frame ({entry['share'] * 100:.1f}%)")
+        top = report['locators'][0]
+        self.report({'INFO'}, f"{total * 1000:.2f} ms/frame, {(total - baseline) * 1000:.2f} ms for locators, "
+                              f"most expensive: {top['name']} ({top['ms_per_frame']:.2f} ms)")
+        return {'FINISHED'}
+
+
 class VIEW3D_PT_loca_locators_panel(Panel):
     version = f"{bl_info['version'][0]}.{bl_info['version'][1]}.{bl_info['version'][2]}"
 
@@ -767,16 +2607,43 @@ class VIEW3D_PT_loca_locators_panel(Panel):
     def draw(self, context):
         props = context.scene.loca
         scene = context.scene
-        is_any_locator = False
-        for bone in context.object.pose.bones:
-            if 'LOCA' in bone.name:
-                is_any_locator = True
+        registry = LocatorRegistry.get(context.object)
+        is_any_locator = bool(registry['locators'])
 
         if context.object.mode == 'POSE':
             layout = self.layout
             col = layout.column()
+            if LocaModalBake.progress is not None:
+                label, factor, eta = LocaModalBake.progress
+                col.progress(factor=factor, type='BAR',
+                             text=f"{label}: {factor * 100:.0f}%" + (f", {eta:.0f} s" if eta is not None else ""))
             if not props.locator_positioning_active:
                 col.prop(props, "without_baking", text='Skip Locator Bake')
+                col.prop(props, "bake_engine", text='Bake')
+                col.prop(props, "isolate_bake", text='Isolate Bake')
+                row = col.row(align=True)
+                row.prop(props, "modal_bake", text='Modal Bake')
+                if props.modal_bake:
+                    row.prop(props, "bake_chunk_frames", text='Chunk')
+                if props.bake_engine == 'PARALLEL':
+                    col.prop(props, "parallel_workers", text='Workers')
+                if props.bake_engine != 'NLA':
+                    row = col.row(align=True)
+                    row.prop(props, "pose_cache", text='Pose Cache')
+                    row.prop(props, "pose_cache_limit", text='MB')
+                    if props.pose_cache:
+                        row = col.row(align=True)
+                        row.prop(props, "disk_cache", text='Disk Cache')
+                        row.prop(props, "disk_cache_limit", text='MB')
+                        if props.disk_cache:
+                            col.prop(props, "disk_cache_dir", text='')
+                col.prop(props, "incremental_bake", text='Incremental Bake')
+                col.prop(props, "reduce_keys", text='Reduce Keys')
+                if props.reduce_keys or props.bake_engine == 'ADAPTIVE':
+                    col_reduce = col.column(align=True)
+                    col_reduce.prop(props, "reduce_tolerance_location", text='Location')
+                    col_reduce.prop(props, "reduce_tolerance_rotation", text='Rotation')
+                    col_reduce.prop(props, "reduce_tolerance_scale", text='Scale')
                 col1 = col.column(align=True)
                 col1.operator(ARMATURE_OT_loca_create_locator.bl_idname,
                               text=" Add Transform Locator", icon='EVENT_T').add_rl_or_al = False
@@ -786,16 +2653,9 @@ class VIEW3D_PT_loca_locators_panel(Panel):
                               text=" Add Attached Locator", icon='EVENT_A')
                 col1.scale_y = 1.3
                 if is_any_locator:
-                    selected_pose_bones = context.selected_pose_bones
-                    show_bake_selected = False
-                    locator_selected = False
-                    for bone in selected_pose_bones:
-                        for constraint in bone.constraints:
-                            if constraint.subtarget and "_LOCA_" in constraint.subtarget:
-                                show_bake_selected = True
-                                break
-                        if "_LOCA_" in bone.name:
-                            locator_selected = True
+                    selected_pose_bones = context.selected_pose_bones or []
+                    show_bake_selected = any(bone.name in registry['driven_bones'] for bone in selected_pose_bones)
+                    locator_selected = any(bone.name in registry['locators'] for bone in selected_pose_bones)
 
                     col.separator()
                     box = col.box()
@@ -843,6 +2703,40 @@ class VIEW3D_PT_loca_locators_panel(Panel):
                 row.prop(props, "bake_start_fr", text="")
                 row.prop(props, "bake_end_fr", text="")
 
+            layout.operator(ARMATURE_OT_loca_purge_widgets.bl_idname, text="Purge Loca Widgets", icon='TRASH')
+            self.draw_profile(layout, props)
+
+    def draw_profile(self, layout, props):
+        box = layout.box()
+        row = box.row()
+        row.prop(props, "show_profile_report", text="Profiling", emboss=False,
+                 icon='TRIA_DOWN' if props.show_profile_report else 'TRIA_RIGHT')
+        row.prop(props, "profile_operators", text="")
+        if not props.show_profile_report:
+            return
+        box.prop(props, "profile_log_path", text="Log")
+        row = box.row(align=True)
+        row.operator(ARMATURE_OT_loca_profile_constraints.bl_idname, text="Profile Constraints", icon='TIME')
+        row.prop(props, "profile_frames", text="Frames")
+        report = LocaProfiler.constraint_report
+        if report is not None:
+            col = box.column(align=True)
+            col.label(text=f"{report['armature']}: {report['ms_per_frame']:.2f} ms/frame, "
+                           f"{report['ms_per_frame_without_locators']:.2f} ms without locators")
+            for entry in report['locators']:
+                col.label(text=f"{entry['name']}: {entry['ms_per_frame']:.2f} ms ({entry['share'] * 100:.1f}%)")
+        report = LocaProfiler.last_report
+        if report is None:
+            box.label(text="No profiled operator yet")
+            return
+        col = box.column(align=True)
+        col.label(text=f"{report['operator']}: {report['seconds'] * 1000:.1f} ms")
+        for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            col.label(text=f"{name}: {stage['seconds'] * 1000:.1f} ms ({stage['calls']}x)")
+        col = box.column(align=True)
+        for name, value in sorted(report['counters'].items()):
+            col.label(text=f"{name.replace('_', ' ').capitalize()}: {value}")
+
 
 classes = [
     locaProps,
@@ -855,6 +2749,8 @@ classes = [
     ARMATURE_OT_loca_select_all_locators,
     ARMATURE_OT_loca_cycle_widget,
     ARMATURE_OT_loca_cycle_color,
+    ARMATURE_OT_loca_purge_widgets,
+    ARMATURE_OT_loca_profile_constraints,
     VIEW3D_PT_loca_locators_panel,
 ]
 
@@ -863,8 +2759,23 @@ def register():
         register_class(cl)
 
     bpy.types.Scene.loca = PointerProperty(type=locaProps)
+    bpy.app.handlers.depsgraph_update_post.append(update_locator_registry)
+    bpy.app.handlers.depsgraph_update_post.append(update_pose_cache_states)
+    bpy.app.handlers.frame_change_post.append(cache_scrubbed_pose)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        handlers.append(invalidate_locator_registry)
+        handlers.append(invalidate_pose_cache)
 
 def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(update_locator_registry)
+    bpy.app.handlers.depsgraph_update_post.remove(update_pose_cache_states)
+    bpy.app.handlers.frame_change_post.remove(cache_scrubbed_pose)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        handlers.remove(invalidate_locator_registry)
+        handlers.remove(invalidate_pose_cache)
+    LocatorRegistry.invalidate()
+    PoseCache.clear()
+    DiskPoseCache.clear()
     for cl in reversed(classes):
         unregister_class(cl)
     del bpy.types.Scene.loca
@@ -0,0 +1,40 @@
+"""Background worker of the Loca parallel bake.
+
+Started by sample_poses_parallel with a temporary copy of the scene:
+
+    blender --background --factory-startup bake.blend --python bake_worker.py -- <job .json file>
+
+Samples the pose matrices of the job bones and the parents their local space needs on the job frames,
+and saves them as a float32 .npy file. Blender stores pose matrices as float32, so nothing is lost;
+the session that started the worker converts them to local space.
+"""
+import importlib.util
+import json
+import os
+import sys
+
+import bpy
+import numpy as np
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    with open(sys.argv[sys.argv.index('--') + 1]) as f:
+        job = json.load(f)
+    # Use the sampler of the addon itself, so workers evaluate frames exactly like a serial bake
+    spec = importlib.util.spec_from_file_location(
+        "loca_bake_worker", os.path.join(ADDON_DIR, "__init__.py"), submodule_search_locations=[ADDON_DIR])
+    loca = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = loca
+    spec.loader.exec_module(loca)
+
+    armature = bpy.data.objects[job['armature']]
+    sampler = loca.PoseSampler(bpy.context, armature, job['bones'], job['frames'], space='POSE')
+    sampler.step()
+    sampler.finish()
+    np.save(job['output'], sampler.pose_matrices.astype(np.float32))
+
+
+if __name__ == "__main__":
+    main()
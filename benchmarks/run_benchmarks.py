@@ -0,0 +1,222 @@
+"""Loca benchmark suite.
+
+Builds synthetic rigs and times every Loca operator on them, in a background Blender session:
+
+    blender --background --factory-startup --python benchmarks/run_benchmarks.py -- --output loca_bench.json
+
+Each rig is a chain of bones with a keyed action; every tenth bone carries an ARMATURE constraint.
+Results, key counts and datablock counts of every run are written to the JSON output file.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from types import SimpleNamespace
+
+import bpy
+import numpy as np
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_STEP = 5
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="Benchmark Loca operators on synthetic rigs")
+    parser.add_argument('--output', default='loca_bench.json', help="JSON file the results are written to")
+    parser.add_argument('--bones', type=int, nargs='+', default=[10, 100, 1000], help="Bone chain lengths")
+    parser.add_argument('--frames', type=int, nargs='+', default=[100, 1000, 10000], help="Action lengths")
+    parser.add_argument('--engines', nargs='+', default=['NLA', 'DIRECT'], help="Bake engines to compare")
+    parser.add_argument('--selected', type=int, default=10, help="Number of bones to create locators for")
+    parser.add_argument('--all-bones', action='store_true',
+                        help="Create locators for every bone of the rig instead of --selected bones")
+    parser.add_argument('--draw-repeats', type=int, default=20, help="Panel redraws timed per run")
+    return parser.parse_args(argv)
+
+
+def load_addon():
+    spec = importlib.util.spec_from_file_location(
+        "loca", os.path.join(ADDON_DIR, "__init__.py"), submodule_search_locations=[ADDON_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["loca"] = module
+    spec.loader.exec_module(module)
+    module.register()
+    return module
+
+
+class NullLayout:
+    """Layout stand-in, so panel draw code can run without a window"""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def __setattr__(self, name, value):
+        pass
+
+
+def reset_data():
+    for collection in (bpy.data.objects, bpy.data.armatures, bpy.data.actions, bpy.data.meshes):
+        for datablock in list(collection):
+            collection.remove(datablock)
+
+
+def build_rig(n_bones, n_frames):
+    reset_data()
+    scene = bpy.context.scene
+    armature_data = bpy.data.armatures.new("BenchRig")
+    armature = bpy.data.objects.new("BenchRig", armature_data)
+    scene.collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+
+    bpy.ops.object.mode_set(mode='EDIT')
+    parent = None
+    for i in range(n_bones):
+        edit_bone = armature_data.edit_bones.new(f"bone_{i:04d}")
+        edit_bone.head = (0.0, 0.0, i * 0.2)
+        edit_bone.tail = (0.0, 0.0, (i + 1) * 0.2)
+        edit_bone.parent = parent
+        edit_bone.use_connect = parent is not None
+        parent = edit_bone
+    bpy.ops.object.mode_set(mode='POSE')
+
+    # Keyed rotation on every bone, written in bulk
+    action = bpy.data.actions.new("BenchAction")
+    armature.animation_data_create()
+    armature.animation_data.action = action
+    key_frames = np.arange(1, n_frames + 1, KEY_STEP, dtype=float)
+    for i, pose_bone in enumerate(armature.pose.bones):
+        pose_bone.rotation_mode = 'XYZ'
+        for axis in range(3):
+            fcurve = action.fcurves.new(f'pose.bones["{pose_bone.name}"].rotation_euler', index=axis,
+                                        action_group=pose_bone.name)
+            values = 0.3 * np.sin(key_frames * (0.05 + 0.01 * axis) + i * 0.1)
+            fcurve.keyframe_points.add(len(key_frames))
+            fcurve.keyframe_points.foreach_set('co', np.column_stack((key_frames, values)).ravel())
+            fcurve.update()
+        if i % 10 == 9:
+            constraint = pose_bone.constraints.new('ARMATURE')
+            target = constraint.targets.new()
+            target.target = armature
+            target.subtarget = armature.pose.bones[0].name
+
+    scene.frame_start = 1
+    scene.frame_end = n_frames
+    scene.use_preview_range = False
+    scene.loca.bake_start_fr = 1
+    scene.loca.bake_end_fr = n_frames
+    return armature
+
+
+def rig_stats(armature):
+    action = armature.animation_data.action if armature.animation_data else None
+    return {
+        'bones': len(armature.pose.bones),
+        'fcurves': len(action.fcurves) if action else 0,
+        'keys': sum(len(fcurve.keyframe_points) for fcurve in action.fcurves) if action else 0,
+        'objects': len(bpy.data.objects),
+        'meshes': len(bpy.data.meshes),
+        'actions': len(bpy.data.actions),
+    }
+
+
+def pose_context(armature, selected):
+    return bpy.context.temp_override(
+        object=armature, active_object=armature, selected_pose_bones=selected,
+        active_pose_bone=selected[-1] if selected else None)
+
+
+def source_bones(armature, args):
+    bones = [pose_bone for pose_bone in armature.pose.bones if '_LOCA' not in pose_bone.name]
+    return bones if args.all_bones else bones[:args.selected]
+
+
+def locators(armature):
+    return [pose_bone for pose_bone in armature.pose.bones if '_LOCA' in pose_bone.name]
+
+
+def driven_bones(armature):
+    return [pose_bone for pose_bone in armature.pose.bones
+            if any('_LOCA_' in getattr(constraint, 'subtarget', '') for constraint in pose_bone.constraints)]
+
+
+def timed(operation):
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def run_case(loca, n_bones, n_frames, engine, args):
+    results = []
+
+    def record(name, armature, seconds):
+        results.append({'operator': name, 'seconds': seconds, **rig_stats(armature)})
+        print(f"  {name:<28} {seconds:9.3f} s")
+
+    def create_transform_locators():
+        armature = build_rig(n_bones, n_frames)
+        bpy.context.scene.loca.bake_engine = engine
+        with pose_context(armature, source_bones(armature, args)):
+            seconds = timed(lambda: bpy.ops.loca.create_locator(add_rl_or_al=False))
+        return armature, seconds
+
+    armature, seconds = create_transform_locators()
+    record('loca.create_locator (TL)', armature, seconds)
+
+    with pose_context(armature, locators(armature)):
+        record('loca.cycle_widget', armature, timed(lambda: bpy.ops.loca.cycle_widget()))
+
+    with pose_context(armature, locators(armature)):
+        panel = SimpleNamespace(layout=NullLayout())
+        panel.draw_profile = lambda layout, props: loca.VIEW3D_PT_loca_locators_panel.draw_profile(
+            panel, layout, props)
+        seconds = timed(lambda: [loca.VIEW3D_PT_loca_locators_panel.draw(panel, bpy.context)
+                                 for _ in range(args.draw_repeats)])
+        record('panel draw', armature, seconds / args.draw_repeats)
+
+    with pose_context(armature, []):
+        record('loca.bake_and_del', armature, timed(lambda: bpy.ops.loca.bake_and_del(bake_on_delete=True)))
+
+    armature, seconds = create_transform_locators()
+    with pose_context(armature, driven_bones(armature)):
+        record('loca.bake_and_del_selected', armature, timed(lambda: bpy.ops.loca.bake_and_del_selected()))
+
+    armature = build_rig(n_bones, n_frames)
+    bpy.context.scene.loca.bake_engine = engine
+    with pose_context(armature, source_bones(armature, args)):
+        record('loca.create_locator (RL)', armature, timed(lambda: bpy.ops.loca.create_locator(add_rl_or_al=True)))
+    with pose_context(armature, locators(armature)):
+        record('loca.create_rl_al', armature, timed(lambda: bpy.ops.loca.create_rl_al()))
+
+    return results
+
+
+def main():
+    args = parse_args()
+    loca = load_addon()
+    report = {
+        'loca_version': '.'.join(map(str, loca.bl_info['version'])),
+        'blender_version': bpy.app.version_string,
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': [],
+    }
+    for n_bones in args.bones:
+        for n_frames in args.frames:
+            for engine in args.engines:
+                print(f"{n_bones} bones, {n_frames} frames, {engine} engine")
+                report['runs'].append({
+                    'bones': n_bones,
+                    'frames': n_frames,
+                    'engine': engine,
+                    'results': run_case(loca, n_bones, n_frames, engine, args),
+                })
+                with open(args.output, 'w') as f:
+                    json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Pytest plugin loaded from pytest.ini.
+
+The repository root is the add-on package and its __init__.py imports bpy. Pytest would import it to set up
+the root as a package, so the root is collected as a plain directory instead. This can't live in a root
+conftest.py, which pytest would import as a module of that same package.
+"""
+import pytest
+
+
+def pytest_collect_directory(path, parent):
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
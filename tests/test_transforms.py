@@ -0,0 +1,92 @@
+"""Round trips of the vectorized transform math, runnable without Blender.
+
+    python -m pytest
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+# The addon package imports bpy, so the module is loaded from its file
+spec = importlib.util.spec_from_file_location(
+    "loca_transforms", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "transforms.py"))
+transforms = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(transforms)
+
+ROTATION_MODES = ['QUATERNION', 'AXIS_ANGLE'] + list(transforms.EULER_ORDERS)
+
+
+def random_matrices(rng, count, negative=False):
+    quaternions = rng.normal(size=(count, 4))
+    scale = rng.uniform(0.2, 3.0, size=(count, 3))
+    if negative:
+        scale[:, 0] *= -1
+    location = rng.uniform(-5.0, 5.0, size=(count, 3))
+    matrices = np.zeros((count, 4, 4))
+    matrices[:, :3, :3] = transforms.quaternion_to_rotation(quaternions) * scale[:, None, :]
+    matrices[:, :3, 3] = location
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+@pytest.mark.parametrize('rotation_mode', ROTATION_MODES)
+def test_decompose_compose_round_trip(rotation_mode):
+    matrices = random_matrices(np.random.default_rng(1), 200)
+    channels = transforms.decompose_channels(matrices, rotation_mode)
+    assert np.allclose(transforms.compose_channels(*channels, rotation_mode), matrices, atol=1e-12)
+
+
+# Eulers are taken from the unflipped matrix like Matrix.to_euler, so only these modes survive negative scale
+@pytest.mark.parametrize('rotation_mode', ['QUATERNION', 'AXIS_ANGLE'])
+def test_negative_scale_round_trip(rotation_mode):
+    matrices = random_matrices(np.random.default_rng(2), 50, negative=True)
+    location, rotation, scale = transforms.decompose(matrices)
+    assert np.allclose(np.linalg.det(rotation), 1.0)
+    assert np.all(scale < 0)
+    channels = transforms.decompose_channels(matrices, rotation_mode)
+    assert np.allclose(transforms.compose_channels(*channels, rotation_mode), matrices, atol=1e-12)
+
+
+def test_quaternions_are_unit_with_non_negative_w():
+    rotation = transforms.decompose(random_matrices(np.random.default_rng(3), 500))[1]
+    quaternions = transforms.rotation_to_quaternion(rotation)
+    assert np.allclose(np.linalg.norm(quaternions, axis=-1), 1.0)
+    assert np.all(quaternions[:, 0] >= 0)
+    assert np.allclose(transforms.quaternion_to_rotation(quaternions), rotation, atol=1e-12)
+
+
+def test_compatible_quaternions_keep_sign_continuity():
+    angles = np.linspace(0.0, 6 * np.pi, 300)
+    quaternions = transforms.axis_angle_to_quaternion(
+        np.column_stack((angles, np.zeros_like(angles), np.ones_like(angles), np.zeros_like(angles))))
+    quaternions[::2] *= -1
+    compatible = transforms.make_compatible_quaternions(quaternions)
+    assert np.all(np.sum(compatible[1:] * compatible[:-1], axis=-1) > 0)
+    assert np.allclose(transforms.quaternion_to_rotation(compatible), transforms.quaternion_to_rotation(quaternions))
+
+
+def test_axis_angle_of_identity_uses_y_axis():
+    axis_angle = transforms.quaternion_to_axis_angle(np.array([[1.0, 0.0, 0.0, 0.0]]))
+    assert np.allclose(axis_angle, [[0.0, 0.0, 1.0, 0.0]])
+
+
+@pytest.mark.parametrize('order', list(transforms.EULER_ORDERS))
+def test_euler_continuity_over_full_turns(order):
+    # Two full turns around each axis in turn, with small rotations around the other axes
+    frames = np.linspace(0.0, 4 * np.pi, 400)
+    for axis in range(3):
+        eulers = np.full((len(frames), 3), 0.1)
+        eulers[:, axis] = frames
+        rotation = transforms.euler_to_rotation(eulers, order)
+        recovered = transforms.rotation_to_euler(rotation[:, None], order)[:, 0]
+        assert np.allclose(transforms.euler_to_rotation(recovered, order), rotation, atol=1e-12)
+        assert np.abs(np.diff(recovered, axis=0)).max() < 0.1
+        assert np.allclose(recovered, eulers, atol=1e-9)
+
+
+def test_euler_continuity_follows_previous_frame():
+    previous = np.array([[0.0, 0.0, 3 * np.pi - 0.05]])
+    rotation = transforms.euler_to_rotation(np.array([[0.0, 0.0, np.pi + 0.05]]), 'XYZ')
+    euler = transforms.rotation_to_euler(rotation[:, None], 'XYZ', previous=previous)[0]
+    assert np.allclose(euler, [[0.0, 0.0, 3 * np.pi + 0.05]])
@@ -0,0 +1,195 @@
+"""Bake and remove Loca locators across many .blend files.
+
+Runs "Bake & Remove Locators" on the armatures of every file through a pool of background Blender processes:
+
+    python tools/loca_batch.py "shots/**/*.blend" --armatures RIG --blender /path/to/blender --report report.json
+
+Without --armatures every armature that has locators is processed. Files are saved in place unless
+--output-dir is given. The report lists time, keys and failures per file.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Bake and remove Loca locators in many .blend files")
+    parser.add_argument('files', nargs='*', help=".blend files or glob patterns")
+    parser.add_argument('--armatures', nargs='+', default=[], help="Armature objects to process, all by default")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help="Blender executable")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Blender processes run at once")
+    parser.add_argument('--output-dir', help="Save baked files here instead of overwriting them")
+    parser.add_argument('--report', default='loca_batch_report.json', help="JSON summary report")
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds a single file may take")
+    parser.add_argument('--remove-only', action='store_true', help="Remove locators without baking")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+# Worker side, runs inside a background Blender session with the shot file opened
+
+def load_addon():
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(
+        "loca", os.path.join(ADDON_DIR, "__init__.py"), submodule_search_locations=[ADDON_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["loca"] = module
+    spec.loader.exec_module(module)
+    module.register()
+    return module
+
+
+def bake_armature(loca, armature, args):
+    import bpy
+
+    action = armature.animation_data.action if armature.animation_data else None
+    result = {
+        'armature': armature.name,
+        'locators': len(loca.LocatorRegistry.get(armature)['locators']),
+        'keys_before': loca.action_key_count(action),
+    }
+    view_layer = bpy.context.view_layer
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    view_layer.objects.active = armature
+    armature.select_set(True)
+    bpy.ops.object.mode_set(mode='POSE')
+
+    start = time.perf_counter()
+    with bpy.context.temp_override(object=armature, active_object=armature, selected_pose_bones=[]):
+        bpy.ops.loca.bake_and_del(bake_on_delete=not args.remove_only)
+    result['seconds'] = time.perf_counter() - start
+
+    action = armature.animation_data.action if armature.animation_data else None
+    result['keys_after'] = loca.action_key_count(action)
+    result['profile'] = loca.LocaProfiler.last_report
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return result
+
+
+def run_worker(args):
+    import bpy
+
+    loca = load_addon()
+    bpy.context.scene.loca.profile_operators = True
+    result = {'file': bpy.data.filepath, 'armatures': [], 'failures': []}
+    for name in args.armatures:
+        if name not in bpy.data.objects or bpy.data.objects[name].type != 'ARMATURE':
+            result['failures'].append(f'Armature "{name}" not found')
+    armatures = [obj for obj in bpy.context.view_layer.objects if obj.type == 'ARMATURE'
+                 and (obj.name in args.armatures if args.armatures
+                      else loca.LocatorRegistry.get(obj)['locators'])]
+
+    for armature in armatures:
+        try:
+            result['armatures'].append(bake_armature(loca, armature, args))
+        except Exception as e:
+            result['failures'].append(f'{armature.name}: {e}')
+
+    if result['armatures']:
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            bpy.ops.wm.save_as_mainfile(filepath=os.path.join(args.output_dir, os.path.basename(bpy.data.filepath)),
+                                        copy=True)
+        else:
+            bpy.ops.wm.save_mainfile()
+
+    with open(args.result, 'w') as f:
+        json.dump(result, f)
+
+
+# Driver side, runs with any Python and starts one background Blender process per file
+
+def expand_files(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        files.extend(path for path in matches if path.endswith('.blend') and path not in files)
+    return files
+
+
+def process_file(path, args):
+    fd, result_path = tempfile.mkstemp(suffix='.json', prefix='loca_batch_')
+    os.close(fd)
+    command = [args.blender, '--background', '--factory-startup', path,
+               '--python', os.path.abspath(__file__), '--', '--worker', '--result', result_path]
+    if args.armatures:
+        command += ['--armatures', *args.armatures]
+    if args.output_dir:
+        command += ['--output-dir', os.path.abspath(args.output_dir)]
+    if args.remove_only:
+        command.append('--remove-only')
+
+    start = time.perf_counter()
+    process = None
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout)
+        with open(result_path) as f:
+            result = json.load(f)
+        if process.returncode:
+            result['failures'].append(f'Blender exited with code {process.returncode}')
+    except subprocess.TimeoutExpired:
+        result = {'file': path, 'armatures': [], 'failures': [f'Timed out after {args.timeout} s']}
+    except (OSError, json.JSONDecodeError):
+        stderr = process.stderr.strip().splitlines()[-5:] if process else []
+        result = {'file': path, 'armatures': [], 'failures': ['Worker did not report a result', *stderr]}
+    finally:
+        os.remove(result_path)
+    result['file'] = path
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_driver(args):
+    files = expand_files(args.files)
+    if not files:
+        print("No .blend files to process")
+        return 1
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(process_file, path, args) for path in files]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            keys_before = sum(armature['keys_before'] for armature in result['armatures'])
+            keys_after = sum(armature['keys_after'] for armature in result['armatures'])
+            status = 'FAILED' if result['failures'] else 'OK'
+            print(f"[{len(results)}/{len(files)}] {status:<6} {result['file']}: {result['seconds']:.1f} s, "
+                  f"{len(result['armatures'])} armatures, keys {keys_before} -> {keys_after}")
+            for failure in result['failures']:
+                print(f"    {failure}")
+
+    results.sort(key=lambda result: files.index(result['file']))
+    report = {
+        'files': len(files),
+        'failed': sum(1 for result in results if result['failures']),
+        'seconds': sum(result['seconds'] for result in results),
+        'results': results,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(files) - report['failed']}/{len(files)} files processed, report written to {args.report}")
+    return 1 if report['failed'] else 0
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    if args.worker:
+        run_worker(args)
+    else:
+        sys.exit(run_driver(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Vectorized transform math on stacks of 4x4 matrices.
+
+Matrices are NumPy arrays of shape (..., 4, 4) with the row layout of mathutils.Matrix, so stacks sampled
+over (frames, bones) are converted and decomposed in one call. Conversions follow the Blender math they
+replace: Matrix.decompose, Matrix.to_euler with a compatible euler, Quaternion.make_compatible and
+Armature.convert_space from pose to local space.
+"""
+import numpy as np
+
+FLT_EPSILON = np.finfo(np.float32).eps
+
+# Axis order and parity of each euler rotation mode
+EULER_ORDERS = {
+    'XYZ': ((0, 1, 2), False),
+    'XZY': ((0, 2, 1), True),
+    'YXZ': ((1, 0, 2), True),
+    'YZX': ((1, 2, 0), False),
+    'ZXY': ((2, 0, 1), False),
+    'ZYX': ((2, 1, 0), True),
+}
+
+
+# Read a matrix property of every item of a bpy collection, foreach_get returns them column by column
+def read_matrices(collection, attr='matrix'):
+    buffer = np.empty(len(collection) * 16, dtype=np.float32)
+    collection.foreach_get(attr, buffer)
+    return buffer.reshape(-1, 4, 4).transpose(0, 2, 1).astype(float)
+
+# Inverse of a matrix stack, with the pseudo-inverse standing in for zero scaled matrices
+def invert(matrices):
+    try:
+        return np.linalg.inv(matrices)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(matrices)
+
+
+class LocalSpace:
+    """Pose space to local space conversion of pose bones, vectorized over frames"""
+
+    def __init__(self, armature, bone_names):
+        pose_bones = armature.pose.bones
+        bone_index = {pose_bone.name: i for i, pose_bone in enumerate(pose_bones)}
+        bones = [pose_bones[name].bone for name in bone_names]
+        self.supported = all(
+            bone.use_local_location and (bone.parent is None
+                                         or (bone.use_inherit_rotation and bone.inherit_scale == 'FULL'))
+            for bone in bones)
+
+        # Pose bones read each frame: the converted bones followed by their parents
+        indices = [bone_index[name] for name in bone_names]
+        parents = sorted({bone_index[bone.parent.name] for bone in bones if bone.parent} - set(indices))
+        self.indices = indices + parents
+        read_position = {index: i for i, index in enumerate(self.indices)}
+        self.parent_positions = np.array(
+            [read_position[bone_index[bone.parent.name]] if bone.parent else -1 for bone in bones], dtype=int)
+
+        # Rest offset of each bone from its parent, bone.matrix_local = parent.matrix_local @ offset
+        rest = np.array([bone.matrix_local for bone in bones], dtype=float).reshape(-1, 4, 4)
+        offset = rest.copy()
+        for j, bone in enumerate(bones):
+            if bone.parent:
+                offset[j] = invert(np.array(bone.parent.matrix_local, dtype=float)) @ rest[j]
+        self.offset_inverse = invert(offset)
+
+    # Convert pose matrices of self.indices bones, shaped (..., len(self.indices), 4, 4), to local matrices
+    def to_local(self, pose_matrices):
+        n_bones = len(self.parent_positions)
+        pose = pose_matrices[..., :n_bones, :, :]
+        parent_pose = np.broadcast_to(np.identity(4), pose.shape).copy()
+        has_parent = self.parent_positions >= 0
+        parent_pose[..., has_parent, :, :] = pose_matrices[..., self.parent_positions[has_parent], :, :]
+        return self.offset_inverse @ invert(parent_pose) @ pose
+
+
+# Split matrices into location, normalized rotation matrices and scale like Matrix.decompose.
+# Negative matrices get a negated rotation and scale, so the rotation stays a proper one.
+def decompose(matrices):
+    matrices = np.asarray(matrices, dtype=float)
+    location = matrices[..., :3, 3].copy()
+    basis = matrices[..., :3, :3]
+    scale = np.linalg.norm(basis, axis=-2)
+    rotation = np.divide(basis, scale[..., None, :], out=np.zeros_like(basis), where=scale[..., None, :] > 0)
+    negative = np.linalg.det(basis) < 0
+    rotation[negative] *= -1
+    scale[negative] *= -1
+    return location, rotation, scale
+
+# Rotation matrices to unit quaternions (w, x, y, z) with a non-negative w, branching like Blender
+def rotation_to_quaternion(rotation):
+    r = np.asarray(rotation, dtype=float)
+    r00, r01, r02 = r[..., 0, 0], r[..., 0, 1], r[..., 0, 2]
+    r10, r11, r12 = r[..., 1, 0], r[..., 1, 1], r[..., 1, 2]
+    r20, r21, r22 = r[..., 2, 0], r[..., 2, 1], r[..., 2, 2]
+
+    candidates = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Largest x
+        s = 2.0 * np.sqrt(np.maximum(1.0 + r00 - r11 - r22, 0.0))
+        s = np.where(r21 < r12, -s, s)
+        candidates.append(((r21 - r12) / s, 0.25 * s, (r10 + r01) / s, (r02 + r20) / s))
+        # Largest y
+        s = 2.0 * np.sqrt(np.maximum(1.0 - r00 + r11 - r22, 0.0))
+        s = np.where(r02 < r20, -s, s)
+        candidates.append(((r02 - r20) / s, (r10 + r01) / s, 0.25 * s, (r21 + r12) / s))
+        # Largest z
+        s = 2.0 * np.sqrt(np.maximum(1.0 - r00 - r11 + r22, 0.0))
+        s = np.where(r10 < r01, -s, s)
+        candidates.append(((r10 - r01) / s, (r02 + r20) / s, (r21 + r12) / s, 0.25 * s))
+        # Largest w, also taken by zero matrices
+        s = 2.0 * np.sqrt(np.maximum(1.0 + r00 + r11 + r22, 0.0))
+        candidates.append((0.25 * s, (r21 - r12) / s, (r02 - r20) / s, (r10 - r01) / s))
+
+    choice = np.where(r22 < 0, np.where(r00 > r11, 0, 1), np.where(r00 < -r11, 2, 3))
+    quaternion = np.zeros(r.shape[:-2] + (4,))
+    for index, candidate in enumerate(candidates):
+        selected = choice == index
+        quaternion[selected] = np.stack(candidate, axis=-1)[selected]
+    return normalize(quaternion, identity=(1.0, 0.0, 0.0, 0.0))
+
+def normalize(vectors, identity):
+    length = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    safe = np.isfinite(length) & (length > 0)
+    return np.where(safe, vectors / np.where(safe, length, 1.0), np.asarray(identity, dtype=float))
+
+# Flip quaternions along the frame axis so each one is compatible with the previous, like make_compatible
+def make_compatible_quaternions(quaternions):
+    quaternions = np.array(quaternions, dtype=float)
+    if len(quaternions) > 1:
+        dot = np.sum(quaternions[1:] * quaternions[:-1], axis=-1)
+        signs = np.cumprod(np.where(dot < 0, -1.0, 1.0), axis=0)
+        quaternions[1:] *= signs[..., None]
+    return quaternions
+
+def quaternion_to_axis_angle(quaternions):
+    quaternions = normalize(np.asarray(quaternions, dtype=float), identity=(1.0, 0.0, 0.0, 0.0))
+    half_angle = np.arccos(np.clip(quaternions[..., 0], -1.0, 1.0))
+    sine = np.sin(half_angle)
+    sine = np.where(np.abs(sine) < FLT_EPSILON, 1.0, sine)
+    axis = quaternions[..., 1:] / sine[..., None]
+    zero_axis = ~np.any(axis, axis=-1)
+    axis[zero_axis] = (0.0, 1.0, 0.0)
+    return np.concatenate(((half_angle * 2.0)[..., None], axis), axis=-1)
+
+# Both euler solutions of normalized rotation matrices for a rotation mode
+def rotation_to_euler_pair(rotation, order):
+    (i, j, k), parity = EULER_ORDERS[order]
+    r = np.asarray(rotation, dtype=float)
+    cy = np.hypot(r[..., i, i], r[..., j, i])
+    regular = cy > 16.0 * FLT_EPSILON
+
+    euler1 = np.empty(r.shape[:-2] + (3,))
+    euler2 = np.empty_like(euler1)
+    euler1[..., i] = np.where(regular, np.arctan2(r[..., k, j], r[..., k, k]), np.arctan2(-r[..., j, k], r[..., j, j]))
+    euler1[..., j] = np.arctan2(-r[..., k, i], cy)
+    euler1[..., k] = np.where(regular, np.arctan2(r[..., j, i], r[..., i, i]), 0.0)
+    euler2[..., i] = np.where(regular, np.arctan2(-r[..., k, j], -r[..., k, k]), euler1[..., i])
+    euler2[..., j] = np.where(regular, np.arctan2(-r[..., k, i], -cy), euler1[..., j])
+    euler2[..., k] = np.where(regular, np.arctan2(-r[..., j, i], -r[..., i, i]), euler1[..., k])
+    if parity:
+        euler1, euler2 = -euler1, -euler2
+    return euler1, euler2
+
+# Wrap eulers by full turns towards previous eulers, like Blender's compatible_eul
+def compatible_euler(euler, previous):
+    delta = euler - previous
+    euler = np.where(delta > np.pi, euler - np.floor(delta / (2 * np.pi) + 0.5) * 2 * np.pi, euler)
+    euler = np.where(delta < -np.pi, euler + np.floor(-delta / (2 * np.pi) + 0.5) * 2 * np.pi, euler)
+    delta = euler - previous
+    flips = np.zeros_like(euler)
+    for i, j, k in ((0, 1, 2), (1, 2, 0), (2, 0, 1)):
+        flip = ((np.abs(delta[..., i]) > np.pi) & (np.abs(delta[..., j]) < np.pi / 2)
+                & (np.abs(delta[..., k]) < np.pi / 2))
+        flips[..., i] = np.where(flip, np.where(delta[..., i] > 0, -2 * np.pi, 2 * np.pi), 0.0)
+    return euler + flips
+
+# Eulers of rotation matrices shaped (frames, ..., 3, 3), each frame compatible with the previous one
+def rotation_to_euler(rotation, order, previous=None):
+    euler1, euler2 = rotation_to_euler_pair(rotation, order)
+    euler = np.empty_like(euler1)
+    for frame in range(len(euler)):
+        if previous is None:
+            first = np.sum(np.abs(euler1[frame]), axis=-1) > np.sum(np.abs(euler2[frame]), axis=-1)
+            previous = np.where(first[..., None], euler2[frame], euler1[frame])
+        else:
+            candidate1 = compatible_euler(euler1[frame], previous)
+            candidate2 = compatible_euler(euler2[frame], previous)
+            second = (np.sum(np.abs(candidate1 - previous), axis=-1)
+                      > np.sum(np.abs(candidate2 - previous), axis=-1))
+            previous = np.where(second[..., None], candidate2, candidate1)
+        euler[frame] = previous
+    return euler
+
+# Location, rotation and scale channels of matrices shaped (frames, ..., 4, 4) for a rotation mode,
+# with the rotation continuity of a bake
+def decompose_channels(matrices, rotation_mode):
+    location, rotation, scale = decompose(matrices)
+    if rotation_mode == 'QUATERNION':
+        return location, make_compatible_quaternions(rotation_to_quaternion(rotation)), scale
+    if rotation_mode == 'AXIS_ANGLE':
+        return location, quaternion_to_axis_angle(rotation_to_quaternion(rotation)), scale
+    # Matrix.to_euler normalizes without flipping negative matrices
+    basis = np.asarray(matrices, dtype=float)[..., :3, :3]
+    length = np.linalg.norm(basis, axis=-2)[..., None, :]
+    basis = np.divide(basis, length, out=np.zeros_like(basis), where=length > 0)
+    return location, rotation_to_euler(basis, rotation_mode), scale
+
+def quaternion_to_rotation(quaternions):
+    w, x, y, z = np.moveaxis(normalize(np.asarray(quaternions, dtype=float), identity=(1.0, 0.0, 0.0, 0.0)), -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)), axis=-1),
+        np.stack((2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)), axis=-1),
+        np.stack((2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+def axis_angle_to_quaternion(axis_angles):
+    axis_angles = np.asarray(axis_angles, dtype=float)
+    axis = normalize(axis_angles[..., 1:], identity=(0.0, 0.0, 0.0))
+    half_angle = np.where(np.any(axis, axis=-1), axis_angles[..., 0] / 2, 0.0)
+    return np.concatenate((np.cos(half_angle)[..., None], axis * np.sin(half_angle)[..., None]), axis=-1)
+
+# Rotation matrices of eulers, the first axis of the rotation mode is applied first
+def euler_to_rotation(eulers, order):
+    eulers = np.asarray(eulers, dtype=float)
+    rotation = np.broadcast_to(np.identity(3), eulers.shape[:-1] + (3, 3))
+    for axis_name in order:
+        axis = 'XYZ'.index(axis_name)
+        cos, sin = np.cos(eulers[..., axis]), np.sin(eulers[..., axis])
+        axis_rotation = np.zeros(eulers.shape[:-1] + (3, 3))
+        axis_rotation[..., axis, axis] = 1.0
+        a, b = (axis + 1) % 3, (axis + 2) % 3
+        axis_rotation[..., a, a] = cos
+        axis_rotation[..., b, b] = cos
+        axis_rotation[..., b, a] = sin
+        axis_rotation[..., a, b] = -sin
+        rotation = axis_rotation @ rotation
+    return rotation
+
+# Compose matrices from channel values like Matrix.LocRotScale
+def compose_channels(location, rotation, scale, rotation_mode):
+    if rotation_mode == 'QUATERNION':
+        rotation_matrices = quaternion_to_rotation(rotation)
+    elif rotation_mode == 'AXIS_ANGLE':
+        rotation_matrices = quaternion_to_rotation(axis_angle_to_quaternion(rotation))
+    else:
+        rotation_matrices = euler_to_rotation(rotation, rotation_mode)
+    location = np.asarray(location, dtype=float)
+    matrices = np.zeros(location.shape[:-1] + (4, 4))
+    matrices[..., :3, :3] = rotation_matrices * np.asarray(scale, dtype=float)[..., None, :]
+    matrices[..., :3, 3] = location
+    matrices[..., 3, 3] = 1.0
+    return matrices